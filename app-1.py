@@ -1,22 +1,24 @@
 import os
 import streamlit as st
 import base64
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
 from streamlit_mic_recorder import speech_to_text
 from gtts import gTTS  # Import gTTS for text-to-speech
 import io
 import streamlit.components.v1 as components
 
 # Import the modules
-from module_meaning import setup_rag_pipeline_meaning
+from module_meaning import get_meaning
 from module_example import setup_rag_pipeline_example
-from module_translation import setup_translation_chain
-from module_melum_kooru import setup_melum_kooru_chain
-from module_nirapuga import validate_nirappugaa_answers, generate_nirappugaa_exercise
+from module_translation import get_translation
+from module_melum_kooru import setup_melum_kooru_chain, format_history
+from module_nirapuga import validate_nirappugaa_answers, generate_nirappugaa_exercise, next_nirappugaa_exercise
 from module_kurippu_eludhuthal import setup_rag_pipeline_kurippu_eludhuthal
 from module_karutharithal import validate_karutharithal_answers, generate_karutharithal_exercise
 from expand_further import setup_expand_further_chain  # Import the expand further module
+from utils.content_filter import moderate_and_answer, moderate_batch
+from models.llm_integration import LLMGatewayError
+from utils.streaming import StreamingAnswer
+from utils.exercise_pool import get_exercise_pool
 from module_essay_writing import (
     reset_essay_session,
     generate_brainstorming_qna,
@@ -24,6 +26,9 @@ from module_essay_writing import (
     get_essay_feedback,
 )
 
+# Shown when the LLM gateway times out or gives up retrying
+BUSY_MESSAGE = "மன்னிக்கவும், பதில் தயாரிக்க நேரமாகிறது. தயவுசெய்து மீண்டும் முயற்சிக்கவும்."
+
 # Set page configuration with wide layout
 st.set_page_config(page_title="வினவி", page_icon="📝", layout='wide')
 
@@ -246,33 +251,6 @@ if st.session_state['prev_mode'] != mode:
     # Update the previous mode
     st.session_state['prev_mode'] = mode
 
-# Function for content moderation
-def moderate_content(user_input: str) -> bool:
-    moderation_prompt = """
-You are an assistant that checks if a user's input is appropriate for a 9-year-old child in Singapore in Tamil and English languages.
-You have to be very accurate in flagging tamil/English bad words, inappropriate words and politically wrong words/phrases.
-Your task is to analyze the input and determine if it contains any inappropriate, abusive, or exploitative content.
-If the input is inappropriate for a child, respond with "Yes". If the input is appropriate, 
-respond with "No".
-
-User Input: {user_input}
-
-Is the user input inappropriate for a 9-year-old child? (Yes/No):
-"""
-    moderation_llm = ChatOpenAI(
-        model_name="gpt-4o",
-        temperature=0.0,
-        max_tokens=5,
-        openai_api_key=api_key
-    )
-    prompt = PromptTemplate(
-        input_variables=["user_input"],
-        template=moderation_prompt
-    )
-    formatted_prompt = prompt.format(user_input=user_input)
-    response = moderation_llm.predict(formatted_prompt).strip().lower()
-    return response.startswith('yes')
-
 def autoplay_audio(text):
     # Remove '**' used for bold text
     cleaned_text = text.replace('**', '')
@@ -318,7 +296,7 @@ if mode == "நிரப்புக பயிற்சி":
     def start_nirappugaa():
         try:
             with st.spinner("பயிற்சி தயாராகிறது..."):
-                exercise = generate_nirappugaa_exercise(api_key)
+                exercise = next_nirappugaa_exercise(api_key)
                 # Check if exercise has non-empty passage, blanks, and options
                 if not exercise.get('passage') or not exercise.get('blanks') or not exercise.get('options'):
                     raise ValueError("பகுதி, குறைவுகள், அல்லது விருப்பங்கள் காலியாக உள்ளன. தயவுசெய்து மீண்டும் முயற்சிக்கவும்.")
@@ -331,6 +309,9 @@ if mode == "நிரப்புக பயிற்சி":
             #st.error(f"பயிற்சி தயாரிப்பதில் ஒரு பிழை ஏற்பட்டது: {str(e)}")
             reset_nirappug_session()
 
+    # Have exercises ready before the child presses தொடங்கு
+    get_exercise_pool("nirappugaa", generate_nirappugaa_exercise).warm(api_key)
+
     if not st.session_state.get('nirappugaa_started'):
         st.markdown(
             "<p style='text-align: center;'>நிரப்புக பயிற்சியை தொடங்குவோம். பயிற்சியை தொடங்க 'தொடங்கு' பொத்தானை அழுத்தவும்.</p>",
@@ -363,10 +344,11 @@ if mode == "நிரப்புக பயிற்சி":
                 # Input fields for blanks with options
                 st.write("### குறைவுகள் நிரப்பவும்:")
                 user_answers = []
+                answer_placeholder = "------பதில் தேர்ந்தெடுக்கவும்------"
                 for idx in range(len(blanks)):
                     user_answer = st.selectbox(
                         f"பகுதி {idx + 1} - சரியான விடையை தேர்வு செய்யவும்:",
-                        options=["------பதில் தேர்ந்தெடுக்கவும்------"] + options,
+                        options=[answer_placeholder] + options,
                         key=f'nirappugaa_answer_{idx}'
                     )
                     user_answers.append(user_answer)
@@ -377,12 +359,9 @@ if mode == "நிரப்புக பயிற்சி":
                     st.session_state['is_processing'] = True
                     # Collect the answers
                     st.session_state['user_answers'] = user_answers
-                    # Pass the answers through content moderation
-                    inappropriate = False
-                    for answer in user_answers:
-                        if moderate_content(answer) and answer != "பதில் தேர்ந்தெடுக்கவும்":
-                            inappropriate = True
-                            break
+                    # Pass the answers through content moderation, all in one check
+                    chosen_answers = [answer for answer in user_answers if answer != answer_placeholder]
+                    inappropriate = any(moderate_batch(chosen_answers))
                     if inappropriate:
                         st.error("உங்கள் பதில்களில் தவறான அல்லது பொருத்தமற்ற உள்ளடக்கம் உள்ளது. தயவுசெய்து சரிசெய்து மீண்டும் முயற்சிக்கவும்.")
                         st.session_state['is_processing'] = False
@@ -404,6 +383,8 @@ if mode == "நிரப்புக பயிற்சி":
                     st.write(st.session_state['exercise_feedback'])
                     if st.button("புதிய பயிற்சி", key='nirappugaa_new_exercise_btn'):
                         reset_nirappug_session()
+                        start_nirappugaa()
+                        st.rerun()
         else:
             st.error("பயிற்சி தரவுகள் காணப்படவில்லை. தயவுசெய்து மீண்டும் தொடங்கவும்.")
             reset_nirappug_session()
@@ -461,44 +442,55 @@ elif mode == "விரிவாக":
         st.session_state['messages'].append({"role": "user", "content": user_input})
         selected_option = st.session_state['selected_option']
 
-        # Check for inappropriate content
-        with st.spinner("சரிபார்க்கிறது..."):
-            if moderate_content(user_input):
+        if selected_option == 'virivaaga':
+            conversation_chain = setup_melum_kooru_chain()
+            # Read this session's history now; the chain runs off the script thread and is shared
+            is_follow_up = st.session_state.get('is_melum_kooru_active')
+            conversation_history = format_history(st.session_state['melum_kooru_messages']) if is_follow_up else ""
+
+            # Moderation and the answer run side by side; the answer is only shown once the input is clean
+            stream = StreamingAnswer(st.empty(), mode="virivaaga", formatter=format_with_bullets)
+            try:
+                with st.spinner("சிந்திக்கிறது..."):
+                    flagged, answer = moderate_and_answer(
+                        user_input,
+                        lambda: conversation_chain.run(history=conversation_history, input=user_input, callbacks=[stream]),
+                        wait=stream.wait,
+                    )
+            except LLMGatewayError:
+                # Timed out or ran out of retries; free the input so the child can ask again
+                stream.finish()
+                st.session_state['is_processing'] = False
+                st.error(BUSY_MESSAGE)
+                st.stop()
+            stream.finish(answer)
+            if flagged:
                 predefined_response = "மன்னிக்கவும், நான் அந்த கேள்விக்கு பதில் அளிக்க முடியாது."
                 st.session_state['messages'].append({"role": "assistant", "content": predefined_response})
                 st.session_state['main_answer'] = predefined_response
                 st.session_state['melum_kooru_answers'] = []  # Clear previous melum kooru answers
                 st.error(predefined_response)
             else:
-                with st.spinner("சிந்திக்கிறது..."):
-                    if selected_option == 'virivaaga':
-                        conversation_chain = setup_melum_kooru_chain()
-                        if st.session_state.get('is_melum_kooru_active'):
-                            # Use the conversation history in 'melum_kooru_messages'
-                            st.session_state['melum_kooru_messages'].append({"role": "user", "content": user_input})
-                            conversation_history = '\n'.join([
-                                f"{msg['role']}: {msg['content']}" for msg in st.session_state['melum_kooru_messages']
-                            ])
-                            answer = conversation_chain.run(input=conversation_history)
-                            st.session_state['melum_kooru_messages'].append({"role": "assistant", "content": answer})
-                        else:
-                            # Start a new conversation
-                            answer = conversation_chain.run(input=user_input)
-                            st.session_state['is_melum_kooru_active'] = True
-                            st.session_state['melum_kooru_messages'] = [
-                                {"role": "user", "content": user_input},
-                                {"role": "assistant", "content": answer}
-                            ]
-                    
-                        # Format the assistant's answer with bullets
-                        formatted_answer = format_with_bullets(answer)
-                        # Append the assistant's answer to messages
-                        st.session_state['messages'].append({"role": "assistant", "content": formatted_answer})
-                        st.session_state['main_answer'] = formatted_answer  # Set main answer
-                        st.session_state['melum_kooru_answers'] = []  # Clear any previous melum kooru answers
-                    else:
-                        st.error("தவறான விருப்பம் தேர்ந்தெடுக்கப்பட்டது.")
-                        #st.stop()
+                if is_follow_up:
+                    st.session_state['melum_kooru_messages'].append({"role": "user", "content": user_input})
+                    st.session_state['melum_kooru_messages'].append({"role": "assistant", "content": answer})
+                else:
+                    # Start a new conversation
+                    st.session_state['is_melum_kooru_active'] = True
+                    st.session_state['melum_kooru_messages'] = [
+                        {"role": "user", "content": user_input},
+                        {"role": "assistant", "content": answer}
+                    ]
+
+                # Format the assistant's answer with bullets
+                formatted_answer = format_with_bullets(answer)
+                # Append the assistant's answer to messages
+                st.session_state['messages'].append({"role": "assistant", "content": formatted_answer})
+                st.session_state['main_answer'] = formatted_answer  # Set main answer
+                st.session_state['melum_kooru_answers'] = []  # Clear any previous melum kooru answers
+        else:
+            st.error("தவறான விருப்பம் தேர்ந்தெடுக்கப்பட்டது.")
+            #st.stop()
 
         st.session_state['input_placeholder'] = ''  # Reset input after processing
         st.session_state['is_processing'] = False
@@ -528,12 +520,19 @@ elif mode == "விரிவாக":
                             f"{msg['role']}: {msg['content']}" for msg in st.session_state['melum_kooru_messages'][-10:]
                         ])
 
-                        # Get the expanded response
-                        with st.spinner("மேலும் சிந்திக்கிறது..."):
-                            expanded_answer = expand_chain.run({
-                                "conversation_history": conversation_history,
-                                "last_assistant_message": last_assistant_message
-                            })
+                        # Get the expanded response, showing it as it is written
+                        stream = StreamingAnswer(st.empty(), mode="expand_further", formatter=format_with_bullets)
+                        try:
+                            with st.spinner("மேலும் சிந்திக்கிறது..."):
+                                expanded_answer = expand_chain.run({
+                                    "conversation_history": conversation_history,
+                                    "last_assistant_message": last_assistant_message
+                                }, callbacks=[stream])
+                        except LLMGatewayError:
+                            stream.finish()
+                            st.error(BUSY_MESSAGE)
+                            st.stop()
+                        stream.finish(expanded_answer)
 
                         # Format the expanded answer with bullets
                         formatted_expanded_answer = format_with_bullets(expanded_answer)
@@ -594,36 +593,42 @@ elif mode == "தமிழ் பயிற்சி":
                 st.session_state['messages'].append({"role": "user", "content": user_input})
                 st.session_state['selected_option'] = key
 
-                # Check for inappropriate content
-                with st.spinner("சரிபார்க்கிறது..."):
-                    if moderate_content(user_input):
+                stream = StreamingAnswer(st.empty(), mode=key, formatter=format_with_bullets)
+                if key == 'meaning':
+                    generate = lambda: get_meaning(user_input, callbacks=[stream])
+                elif key == 'example':
+                    qa_chain = setup_rag_pipeline_example()
+                    generate = lambda: qa_chain({"query": user_input}, callbacks=[stream])['result']
+                elif key == 'translation':
+                    generate = lambda: get_translation(user_input, callbacks=[stream])
+                else:
+                    generate = None
+                    st.error("தவறான விருப்பம் தேர்ந்தெடுக்கப்பட்டது.")
+                    #st.stop()
+
+                if generate is not None:
+                    # Moderation and the answer run side by side; the answer is only used if the input is clean
+                    try:
+                        with st.spinner("சிந்திக்கிறது..."):
+                            flagged, answer = moderate_and_answer(user_input, generate, wait=stream.wait)
+                    except LLMGatewayError:
+                        stream.finish()
+                        st.session_state['is_processing'] = False
+                        st.error(BUSY_MESSAGE)
+                        st.stop()
+                    stream.finish(answer)
+                    if flagged:
                         predefined_response = "மன்னிக்கவும், நான் அந்த கேள்விக்கு பதில் அளிக்க முடியாது."
                         st.session_state['messages'].append({"role": "assistant", "content": predefined_response})
                         st.session_state['last_answer'] = predefined_response
                         st.error(predefined_response)
                     else:
-                        with st.spinner("சிந்திக்கிறது..."):
-                            if key == 'meaning':
-                                qa_chain = setup_rag_pipeline_meaning()
-                                result = qa_chain({"query": user_input})
-                                answer = result['result']
-                            elif key == 'example':
-                                qa_chain = setup_rag_pipeline_example()
-                                result = qa_chain({"query": user_input})
-                                answer = result['result']
-                            elif key == 'translation':
-                                translation_chain = setup_translation_chain()
-                                answer = translation_chain.run(question=user_input)
-                            else:
-                                st.error("தவறான விருப்பம் தேர்ந்தெடுக்கப்பட்டது.")
-                                #st.stop()
-
-                            # Format the assistant's answer with bullets
-                            formatted_answer = format_with_bullets(answer)
-
-                            # Append the assistant's answer to messages
-                            st.session_state['messages'].append({"role": "assistant", "content": formatted_answer})
-                            st.session_state['last_answer'] = formatted_answer
+                        # Format the assistant's answer with bullets
+                        formatted_answer = format_with_bullets(answer)
+
+                        # Append the assistant's answer to messages
+                        st.session_state['messages'].append({"role": "assistant", "content": formatted_answer})
+                        st.session_state['last_answer'] = formatted_answer
 
                 st.session_state['input_placeholder'] = ''  # Reset input after processing
                 st.session_state['is_processing'] = False
@@ -4,6 +4,8 @@ from streamlit_mic_recorder import speech_to_text
 from langchain_community.vectorstores import FAISS
 from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.vectorstores import FAISS
+from utils.llm_factory import get_chat_llm
+from utils.prompt_registry import get_prompt
 
 # Import the modules
 from module_meaning import setup_rag_pipeline as setup_rag_pipeline_meaning
@@ -33,31 +35,11 @@ def moderate_content(user_input: str) -> bool:
     Uses GPT-4 to check if the user input contains inappropriate, abusive, or exploitative content.
     Returns True if inappropriate content is found, False otherwise.
     """
-    moderation_prompt = """
-You are an assistant that checks if a user's input is appropriate for a 9-year-old child in Singapore.
-Your task is to analyze the input and determine if it contains any inappropriate, abusive, or exploitative content.
-If the input is inappropriate for a child, respond with "Yes".
-If the input is appropriate, respond with "No".
-
-User Input: {user_input}
-
-Is the user input inappropriate for a 9-year-old child? (Yes/No):
-"""
-
     # Initialize the content moderation LLM
-    moderation_llm = ChatOpenAI(
-        model_name="gpt-4",
-        temperature=0.0,
-        max_tokens=5,
-    )
-
-    prompt = PromptTemplate(
-        input_variables=["user_input"],
-        template=moderation_prompt,
-    )
+    moderation_llm = get_chat_llm(model_name="gpt-4", temperature=0.0, max_tokens=5, module="moderation")
 
     # Format the prompt
-    formatted_prompt = prompt.format(user_input=user_input)
+    formatted_prompt = get_prompt("moderation").format(user_input=user_input)
 
     # Get the moderation response
     response = moderation_llm.predict(formatted_prompt).strip().lower()
@@ -1,10 +1,305 @@
 # models/llm_integration.py
+import asyncio
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, List, Optional
+
 import openai
+from langchain.chat_models.base import BaseChatModel
+from langchain.schema import AIMessage, ChatGeneration, ChatResult
+
+from utils.llm_factory import get_async_http_client
+from utils.llm_metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds allowed for one attempt, including a streamed response
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", 45))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+# Requests in flight per model across every session in the process
+MODEL_CONCURRENCY = {"gpt-4o": 16, "gpt-4": 4, "gpt-3.5-turbo": 16}
+DEFAULT_CONCURRENCY = int(os.getenv("LLM_DEFAULT_CONCURRENCY", 8))
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    asyncio.TimeoutError,
+)
+
+_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+class LLMGatewayError(RuntimeError):
+    """A request failed after its retries or timed out."""
+
+
+class LLMGateway:
+    """
+    Asyncio gateway for OpenAI chat completions shared by every session.
+
+    All requests run on one event loop in a background thread over a pooled
+    AsyncOpenAI client, so a worker serves many sessions without a thread
+    per request. Each request has a timeout per attempt, 429/5xx and
+    connection errors are retried with jittered exponential backoff, and a
+    semaphore per model caps requests in flight. complete() is the blocking
+    facade for Streamlit's script thread.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._loop = None
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._semaphores = {}
+        self.counts = {"calls": 0, "retries": 0, "timeouts": 0, "failures": 0}
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def _client(self, api_key):
+        client = self._clients.get(api_key)
+        if client is None:
+            client = openai.AsyncOpenAI(api_key=api_key, http_client=get_async_http_client(), max_retries=0)
+            self._clients[api_key] = client
+        return client
+
+    def _semaphore(self, model):
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(MODEL_CONCURRENCY.get(model, DEFAULT_CONCURRENCY))
+            self._semaphores[model] = semaphore
+        return semaphore
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    @staticmethod
+    def _backoff(attempt, error):
+        retry_after = getattr(getattr(error, "response", None), "headers", {}).get("retry-after")
+        try:
+            return min(BACKOFF_CAP, float(retry_after))
+        except (TypeError, ValueError):
+            # Full jitter keeps sessions that failed together from retrying together
+            return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    async def _attempt(self, client, request, on_token):
+        if on_token is None:
+            response = await client.chat.completions.create(**request)
+            usage = response.usage.model_dump() if response.usage else {}
+            return response.choices[0].message.content or "", usage
+        parts, usage = [], {}
+        stream = await client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage.model_dump()
+            if chunk.choices and chunk.choices[0].delta.content:
+                token = chunk.choices[0].delta.content
+                parts.append(token)
+                on_token(token)
+        return "".join(parts), usage
+
+    async def acomplete(self, messages, model="gpt-4o", temperature=0.3, max_tokens=None, api_key=None,
+                        stop=None, timeout=None, on_token=None, response_format=None, module="default"):
+        """
+        Run one chat completion on the gateway loop.
+
+        Args:
+            messages (list[dict]): OpenAI chat messages.
+            response_format (dict): Passed to the API, e.g. a JSON schema.
+            module (str): Caller the call is recorded under in utils.llm_metrics.
+            on_token (callable): Called on the gateway loop with each streamed token.
+
+        Returns:
+            dict: text, usage (token counts), model, attempts, queue_seconds
+            (time spent waiting for the model's concurrency slot),
+            ttft_seconds and latency_seconds.
+        """
+        client = self._client(api_key or os.getenv("OPENAI_API_KEY"))
+        request = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens is not None:
+            request["max_tokens"] = max_tokens
+        if stop:
+            request["stop"] = stop
+        if response_format:
+            request["response_format"] = response_format
+        timeout = timeout or self.timeout
+        self._count("calls")
+
+        queued = time.perf_counter()
+        async with self._semaphore(model):
+            queue_seconds = time.perf_counter() - queued
+            streamed, first_token = [], [None]
+
+            def track(token):
+                if not streamed:
+                    first_token[0] = time.perf_counter() - queued
+                streamed.append(token)
+                on_token(token)
+
+            def failed(error, attempt):
+                get_metrics().record_call(
+                    module, model, queue_seconds=queue_seconds, ttft_seconds=first_token[0],
+                    latency_seconds=time.perf_counter() - queued, retries=attempt, error=type(error).__name__,
+                )
+
+            for attempt in range(self.max_retries + 1):
+                try:
+                    text, usage = await asyncio.wait_for(
+                        self._attempt(client, request, None if on_token is None else track), timeout
+                    )
+                    result = {"text": text, "usage": usage, "model": model, "attempts": attempt + 1,
+                              "queue_seconds": queue_seconds, "ttft_seconds": first_token[0],
+                              "latency_seconds": time.perf_counter() - queued}
+                    self._record(module, result)
+                    return result
+                except RETRYABLE_ERRORS as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        self._count("timeouts")
+                    # Tokens already shown cannot be taken back, so a broken stream is not retried
+                    if streamed or attempt == self.max_retries:
+                        self._count("failures")
+                        failed(e, attempt)
+                        raise LLMGatewayError(f"{model} request failed after {attempt + 1} attempts: {e!r}") from e
+                    delay = self._backoff(attempt, e)
+                    self._count("retries")
+                    logger.warning("%s request failed (%r); retry %d in %.1fs", model, e, attempt + 1, delay)
+                    await asyncio.sleep(delay)
+                except Exception as e:
+                    # Bad requests and auth errors are not retried but still show up in the metrics
+                    self._count("failures")
+                    failed(e, attempt)
+                    raise
+
+    @staticmethod
+    def _record(module, result):
+        usage = result["usage"]
+        get_metrics().record_call(
+            module, result["model"],
+            prompt_tokens=usage.get("prompt_tokens") or 0,
+            completion_tokens=usage.get("completion_tokens") or 0,
+            cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0,
+            queue_seconds=result["queue_seconds"],
+            ttft_seconds=result["ttft_seconds"],
+            latency_seconds=result["latency_seconds"],
+            retries=result["attempts"] - 1,
+        )
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the gateway loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def complete(self, messages, on_token=None, **kwargs):
+        """
+        Blocking facade over acomplete() for synchronous callers.
+
+        Streamed tokens are handed to on_token on the calling thread, so
+        Streamlit callbacks can update the page.
+        """
+        if on_token is None:
+            return self.submit(self.acomplete(messages, **kwargs)).result()
+        tokens = queue.Queue()
+        future = self.submit(self.acomplete(messages, on_token=tokens.put, **kwargs))
+        while True:
+            try:
+                on_token(tokens.get(timeout=0.05))
+            except queue.Empty:
+                if future.done() and tokens.empty():
+                    return future.result()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    LangChain chat model that sends every request through the LLMGateway.
+
+    Drop-in for ChatOpenAI in chains and predict(). Token usage is reported
+    in llm_output the way ChatOpenAI reports it, so get_openai_callback keeps
+    working. Tokens are only streamed to callbacks on the synchronous path.
+    A response_format keyword given to predict() is passed to the API.
+    """
+
+    model_name: str = "gpt-4o"
+    temperature: float = 0.3
+    max_tokens: Optional[int] = None
+    openai_api_key: Optional[str] = None
+    streaming: bool = False
+    timeout: Optional[float] = None
+    module: str = "default"
+
+    @property
+    def _llm_type(self) -> str:
+        return "openai-gateway"
+
+    def _request(self, messages, stop, response_format=None):
+        return {
+            "messages": [
+                {"role": _ROLES.get(message.type, getattr(message, "role", "user")), "content": message.content}
+                for message in messages
+            ],
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "api_key": self.openai_api_key,
+            "stop": stop,
+            "timeout": self.timeout,
+            "response_format": response_format,
+            "module": self.module,
+        }
+
+    def _result(self, response):
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=response["text"]))],
+            llm_output={"token_usage": response["usage"], "model_name": self.model_name},
+        )
+
+    def _generate(self, messages: List[Any], stop: Optional[List[str]] = None, run_manager: Any = None,
+                  **kwargs: Any) -> ChatResult:
+        on_token = run_manager.on_llm_new_token if self.streaming and run_manager else None
+        request = self._request(messages, stop, kwargs.get("response_format"))
+        return self._result(get_gateway().complete(on_token=on_token, **request))
+
+    async def _agenerate(self, messages: List[Any], stop: Optional[List[str]] = None, run_manager: Any = None,
+                         **kwargs: Any) -> ChatResult:
+        gateway = get_gateway()
+        future = gateway.submit(gateway.acomplete(**self._request(messages, stop, kwargs.get("response_format"))))
+        return self._result(await asyncio.wrap_future(future))
 
-# Set your OpenAI API key
-openai.api_key = 'YOUR_OPENAI_API_KEY'
 
-def generate_response(query, context):
+def generate_response(query, context, model="gpt-3.5-turbo"):
     """
     Generate a response using GPT-3.5/4 with the provided context.
 
@@ -15,11 +310,12 @@ def generate_response(query, context):
     Returns:
         str: Generated response from the LLM.
     """
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
+    response = get_gateway().complete(
+        [
             {"role": "system", "content": "You are a friendly learning companion that communicates in simple Tamil."},
             {"role": "user", "content": f"{query}. Context: {context}"}
-        ]
+        ],
+        model=model,
+        module="llm_integration",
     )
-    return response['choices'][0]['message']['content']
\ No newline at end of file
+    return response["text"]
@@ -1,93 +1,254 @@
 # module_karutharithal.py
 
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.callbacks import get_openai_callback
+
+from utils.context_packer import count_tokens
+from utils.exercise_pool import get_exercise_pool
+from utils.llm_factory import get_chat_llm
+from utils.llm_metrics import record_count
+from utils.prompt_registry import CORRECT_PREFIX, INCORRECT_PREFIX, QUESTION_COUNT, get_prompt
+from utils.structured_output import ask_json, record
+
+logger = logging.getLogger(__name__)
+
+# "batch" grades every answer in one call; "concurrent" sends one call per question in parallel
+GRADING_MODE = os.getenv("KARUTHARITHAL_GRADING_MODE", "batch")
+GRADING_WORKERS = 6
+
+# Numbering the model sometimes leaves on a question, e.g. "1. " or "2) "
+_QUESTION_NUMBER = re.compile(r"^\s*\d+\s*[.)]\s*")
+
+KARUTHARITHAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "passage": {"type": "string", "minLength": 1},
+        "questions": {"type": "array", "items": {"type": "string", "minLength": 1}, "minItems": QUESTION_COUNT},
+    },
+    "required": ["passage", "questions"],
+}
+
+_executor = None
+_lock = threading.Lock()
+_grading = {
+    mode: {"runs": 0, "questions": 0, "llm_calls": 0, "seconds": 0.0, "call_seconds": 0.0, "tokens": 0,
+           "latency_saved_seconds": 0.0, "tokens_saved": 0}
+    for mode in ("batch", "concurrent")
+}
+
 
 def generate_karutharithal_exercise(api_key):
     """
     Generate a child-friendly 150-word passage and 3 related questions.
+
+    The reply is JSON checked against KARUTHARITHAL_SCHEMA; if questions are
+    missing, only those are asked for again.
     """
     # Use OpenAI API to generate the passage and questions
-    llm = ChatOpenAI(
-        model_name="gpt-4o",
-        temperature=0.7,
-        openai_api_key=api_key
-    )
-    
-    prompt = """
-Generate a child-friendly passage in Tamil suitable for a 9-year-old child. The passage should be approximately 150 words, meaningful, and easy to understand.
-The passage should be completetely grammatically and politically correct.
-The stories should never have direct speech.
-After the passage, create three questions based directly on the passage content. The answers to these questions should be available directly in the passage.
-
-Provide the output in the following format:
-
-Passage:
-[Your passage]
-
-Questions:
-1. Question one?
-2. Question two?
-3. Question three?
-"""
-    response = llm.predict(prompt)
-    # Parse the response to extract the passage and questions
-    lines = response.strip().split('\n')
-    passage_lines = []
-    questions = []
-    is_passage = False
-    is_questions = False
-    for line in lines:
-        if line.strip().lower().startswith('passage:'):
-            is_passage = True
-            is_questions = False
-            continue
-        elif line.strip().lower().startswith('questions:'):
-            is_passage = False
-            is_questions = True
-            continue
-        if is_passage:
-            passage_lines.append(line)
-        elif is_questions:
-            if line.strip():
-                questions.append(line.strip()[3:].strip())  # Remove numbering
-    passage = '\n'.join(passage_lines).strip()
-    return {'passage': passage, 'questions': questions}
+    llm = get_chat_llm(model_name="gpt-4o", temperature=0.7, api_key=api_key, module="karutharithal")
+    record("karutharithal", exercises=1)
+    try:
+        data, errors = ask_json(llm, get_prompt("karutharithal_exercise").template, KARUTHARITHAL_SCHEMA, "karutharithal_exercise",
+                                "karutharithal")
+        if data is None or any(error.startswith(("$:", "$.passage")) for error in errors):
+            raise ValueError("The passage was not generated correctly: " + "; ".join(errors))
+        passage = data["passage"].strip()
+        questions = [
+            _QUESTION_NUMBER.sub("", question).strip() for question in data.get("questions", [])
+            if isinstance(question, str) and question.strip()
+        ]
+        if len(questions) < QUESTION_COUNT:
+            questions = _repair_questions(llm, passage, questions)
+    except ValueError:
+        record("karutharithal", failures=1)
+        raise
+    return {'passage': passage, 'questions': questions[:QUESTION_COUNT]}
 
-def validate_karutharithal_answers(passage, questions, user_answers, api_key):
+def _repair_questions(llm, passage, questions):
+    """Ask only for the questions that are missing."""
+    count = QUESTION_COUNT - len(questions)
+    record("karutharithal", repairs=1)
+    schema = {
+        "type": "object",
+        "properties": {"questions": {"type": "array", "items": {"type": "string", "minLength": 1}, "minItems": count}},
+        "required": ["questions"],
+    }
+    prompt = get_prompt("karutharithal_questions").format(passage=passage, count=count, existing="\n".join(questions) or "-")
+    data, errors = ask_json(llm, prompt, schema, "questions", "karutharithal")
+    if errors:
+        raise ValueError("The missing questions could not be generated: " + "; ".join(errors))
+    record("karutharithal", repaired=1)
+    return questions + [_QUESTION_NUMBER.sub("", question).strip() for question in data["questions"][:count]]
+
+def next_karutharithal_exercise(api_key):
     """
-    Validate the user's answers and provide detailed feedback.
+    Return a ready exercise from the pre-generated pool, refilling it in the background.
     """
-    # Use OpenAI API to validate the answers
-    llm = ChatOpenAI(
-        model_name="gpt-4o",
-        temperature=0.7,
-        openai_api_key=api_key
+    return get_exercise_pool("karutharithal", generate_karutharithal_exercise).pop(api_key)
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=GRADING_WORKERS, thread_name_prefix="grading")
+    return _executor
+
+
+def _verdict(feedback):
+    """True for a correct answer, False for a wrong one, None when the child wrote nothing."""
+    if feedback.startswith(CORRECT_PREFIX[:-1]):
+        return True
+    if feedback.startswith(INCORRECT_PREFIX[:-1]):
+        return False
+    return None
+
+
+def _grade_one(llm, passage, question, answer):
+    start = time.perf_counter()
+    with get_openai_callback() as usage:
+        response = llm.predict(get_prompt("karutharithal_grading").format(passage=passage, question=question, answer=answer))
+    return response.strip(), usage.total_tokens, time.perf_counter() - start
+
+
+def _grade_concurrent(llm, passage, questions, user_answers):
+    """One call per question, run side by side; returns feedback, tokens and the summed call latency."""
+    futures = [
+        _get_executor().submit(_grade_one, llm, passage, question, answer)
+        for question, answer in zip(questions, user_answers)
+    ]
+    # Futures are read in submission order, so feedback stays in question order
+    results = [future.result() for future in futures]
+    return [feedback for feedback, _, _ in results], sum(r[1] for r in results), sum(r[2] for r in results)
+
+
+def _batch_prompt(passage, questions, user_answers):
+    # Each pair is JSON-quoted so an answer cannot pose as another question
+    items = "\n".join(
+        f"{i}. Question: {json.dumps(question, ensure_ascii=False)}\n   Child's Answer: {json.dumps(answer, ensure_ascii=False)}"
+        for i, (question, answer) in enumerate(zip(questions, user_answers), 1)
     )
-    feedback = ''
-    for idx, (question, user_answer) in enumerate(zip(questions, user_answers)):
-        prompt = f"""
-You are a helpful assistant proficient in Tamil.
+    return get_prompt("karutharithal_batch_grading").format(passage=passage, count=len(questions), items=items)
+
+
+def _grade_batch(llm, passage, questions, user_answers):
+    """All questions in one call; returns feedback and tokens, or None if the reply does not parse."""
+    with get_openai_callback() as usage:
+        response = llm.predict(_batch_prompt(passage, questions, user_answers))
+    try:
+        feedback = json.loads(response[response.index("["):response.rindex("]") + 1])
+        if len(feedback) != len(questions):
+            raise ValueError(f"expected {len(questions)} responses, got {len(feedback)}")
+    except ValueError as e:
+        logger.warning("Unparseable batch grading reply (%s); grading questions one by one", e)
+        return None, usage.total_tokens
+    return [str(item).strip() for item in feedback], usage.total_tokens
+
+
+def _single_call_seconds(default):
+    """Mean latency of one single-question grading call, measured by concurrent runs."""
+    with _lock:
+        stats = _grading["concurrent"]
+        return stats["call_seconds"] / stats["questions"] if stats["questions"] else default
+
+
+def _record(mode, questions, llm_calls, seconds, tokens, call_seconds=0.0, latency_saved=0.0, tokens_saved=0):
+    with _lock:
+        stats = _grading[mode]
+        stats["runs"] += 1
+        stats["questions"] += questions
+        stats["llm_calls"] += llm_calls
+        stats["seconds"] += seconds
+        stats["call_seconds"] += call_seconds
+        stats["tokens"] += tokens
+        stats["latency_saved_seconds"] += latency_saved
+        stats["tokens_saved"] += tokens_saved
+    record_count("grading_questions", questions, mode=mode)
+    record_count("grading_latency_saved_seconds", latency_saved, mode=mode)
+    record_count("grading_tokens_saved", tokens_saved, mode=mode)
+    logger.info("Graded %d answers (%s) in %.2fs, %d tokens; saved %.2fs and %d tokens",
+                questions, mode, seconds, tokens, latency_saved, tokens_saved)
 
-A child has read the following passage:
 
-Passage:
-{passage}
+def grade_answers(passage, questions, user_answers, api_key, mode=None):
+    """
+    Grade a child's answers to the comprehension questions.
+
+    Args:
+        passage (str): The passage the child read.
+        questions (list[str]): The questions, in order.
+        user_answers (list[str]): The child's answers, in the same order.
+        api_key (str): OpenAI API key.
+        mode (str): "batch" for one call covering every answer, or
+            "concurrent" for one call per question through a bounded pool.
+            Defaults to GRADING_MODE. A batch reply that does not parse is
+            graded again concurrently.
+
+    Returns:
+        list[dict]: One {"question", "answer", "correct", "feedback"} per
+        question, in order; "correct" is None when no answer was given.
+    """
+    mode = mode or GRADING_MODE
+    if mode not in _grading:
+        raise ValueError(f"Unknown grading mode: {mode}")
+    # Grading is a judgement, not writing; the same answer should get the same verdict every time
+    llm = get_chat_llm(model_name="gpt-4o", temperature=0, api_key=api_key, module="karutharithal_grading")
+    start = time.perf_counter()
+
+    feedback, failed_calls, wasted_tokens = None, 0, 0
+    if mode == "batch" and len(questions) > 1:
+        feedback, tokens = _grade_batch(llm, passage, questions, user_answers)
+        if feedback is None:
+            failed_calls, wasted_tokens = 1, tokens
+        else:
+            # What the separate calls would have sent: the passage and instructions once per question
+            separate_prompts = sum(
+                count_tokens(get_prompt("karutharithal_grading").format(passage=passage, question=question, answer=answer))
+                for question, answer in zip(questions, user_answers)
+            )
+            batch_prompt = count_tokens(_batch_prompt(passage, questions, user_answers))
+            seconds = time.perf_counter() - start
+            # Estimated, not measured: the n-1 single calls the batch replaced, at the mean single-call
+            # latency of concurrent runs, or at this call's own latency until one has been measured
+            _record("batch", len(questions), 1, seconds, tokens, call_seconds=seconds,
+                    latency_saved=_single_call_seconds(seconds) * (len(questions) - 1),
+                    tokens_saved=max(0, separate_prompts - batch_prompt))
+    if feedback is None:
+        feedback, tokens, call_seconds = _grade_concurrent(llm, passage, questions, user_answers)
+        seconds = time.perf_counter() - start
+        # Saved against running the same calls one after another
+        _record("concurrent", len(questions), len(questions) + failed_calls, seconds, tokens + wasted_tokens,
+                call_seconds=call_seconds, latency_saved=max(0.0, call_seconds - seconds))
 
-They have answered the following question:
+    return [
+        {"question": question, "answer": answer, "correct": _verdict(text), "feedback": text}
+        for question, answer, text in zip(questions, user_answers, feedback)
+    ]
 
-Question:
-{question}
 
-Child's Answer:
-{user_answer}
+def grading_stats():
+    """Totals per grading mode, with mean latency and tokens per graded question."""
+    with _lock:
+        stats = {mode: dict(values) for mode, values in _grading.items()}
+    for mode, values in stats.items():
+        # Concurrent savings are measured against the summed call latency; batch savings are estimated
+        values["latency_saved_estimated"] = mode == "batch"
+        questions = values["questions"]
+        values["seconds_per_question"] = values["seconds"] / questions if questions else 0.0
+        values["tokens_per_question"] = values["tokens"] / questions if questions else 0.0
+    return stats
 
-First, determine if the child's answer is correct based on the passage. Find similarity to the given answer and mark an answer correct if similarity is more than 30 percent. If it is correct, respond: "சரி! உங்கள் பதில் சரியானது." Then, provide a brief explanation reinforcing why the answer is correct.
-If there is no answer at all then respond in tamil stating that no answer was entered.
-If the answer is incorrect, respond: "தவறு. உங்கள் பதில் சரியானதல்ல." Then, explain what the correct answer is and why it is correct, referencing the passage.
 
-Provide your response in Tamil.
-"""
-        response = llm.predict(prompt)
-        feedback += f"பதில் {idx+1}:\n{response.strip()}\n\n"
-    return feedback.strip()
+def validate_karutharithal_answers(passage, questions, user_answers, api_key):
+    """
+    Validate the user's answers and provide detailed feedback.
+    """
+    graded = grade_answers(passage, questions, user_answers, api_key)
+    return "\n\n".join(f"பதில் {idx+1}:\n{item['feedback']}" for idx, item in enumerate(graded))
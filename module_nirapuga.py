@@ -1,124 +1,132 @@
-from langchain.chat_models import ChatOpenAI
+import random
+import re
+
+from utils.exercise_pool import SOURCE_FIELD, get_exercise_pool
+from utils.llm_factory import get_chat_llm
+from utils.prompt_registry import BLANK, OPTION_COUNT, get_prompt
+from utils.structured_output import ask_json, record
+
+BLANK_PATTERN = re.compile(r"_{3,}")
+# Characters that continue a word: ASCII letters, digits and the Tamil block
+_WORD_CHAR = r"[0-9A-Za-z\u0b80-\u0bff]"
+
+_words = {"type": "array", "items": {"type": "string", "minLength": 1}}
+
+NIRAPPUGAA_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "passage": {"type": "string", "minLength": 1},
+        "blanks": {**_words, "minItems": 2, "maxItems": 3},
+        "clues": {**_words, "minItems": 2},
+        "options": {**_words, "minItems": OPTION_COUNT},
+    },
+    "required": ["passage", "blanks", "clues", "options"],
+}
+
+def _word_pattern(word):
+    """Match word as a whole token; Tamil vowel signs are not \\w, so spell the word characters out."""
+    return re.compile(f"(?<!{_WORD_CHAR}){re.escape(word)}(?!{_WORD_CHAR})")
+
+
+def _mark_blanks(passage, blanks):
+    """
+    Turn the blank words left in the passage into blanks, so blanks and markers line up.
+
+    If markers are missing, the blanks are walked in order: each one is
+    either the next marker already in the passage or the next whole-token
+    occurrence of its word, whichever comes first, so பழம் never matches
+    inside பழம்பெரும்.
+    """
+    passage = BLANK_PATTERN.sub(BLANK, passage)
+    if passage.count(BLANK) == len(blanks):
+        return passage
+    position = 0
+    for word in blanks:
+        marker = passage.find(BLANK, position)
+        match = _word_pattern(word).search(passage, position)
+        if match and (marker == -1 or match.start() < marker):
+            passage = passage[:match.start()] + BLANK + passage[match.end():]
+            position = match.start() + len(BLANK)
+        elif marker != -1:
+            position = marker + len(BLANK)
+        else:
+            raise ValueError(f"The answer '{word}' is neither blanked nor found in the passage.")
+    if passage.count(BLANK) != len(blanks):
+        raise ValueError(f"The passage has {passage.count(BLANK)} blanks but {len(blanks)} answers were given.")
+    return passage
+
+
+def _repair_clues(llm, passage, blanks, clues):
+    """Ask only for the clues that are missing."""
+    missing = blanks[len(clues):]
+    record("nirappugaa", repairs=1)
+    schema = {"type": "object", "properties": {"clues": {**_words, "minItems": len(missing)}}, "required": ["clues"]}
+    data, errors = ask_json(llm, get_prompt("nirappugaa_clues").format(passage=passage, words=", ".join(missing)), schema,
+                            "clues", "nirappugaa")
+    if errors:
+        raise ValueError("The missing clues could not be generated: " + "; ".join(errors))
+    record("nirappugaa", repaired=1)
+    return clues + data["clues"][:len(missing)]
+
+
+def _repair_options(llm, blanks, options):
+    """Make sure every answer is an option, asking only for the distractors that are missing."""
+    options = list(dict.fromkeys(option.strip() for option in options if option.strip()))
+    options += [word for word in blanks if word not in options]
+    count = OPTION_COUNT - len(options)
+    if count > 0:
+        record("nirappugaa", repairs=1)
+        schema = {"type": "object", "properties": {"words": {**_words, "minItems": count}}, "required": ["words"]}
+        prompt = get_prompt("nirappugaa_distractors").format(answers=", ".join(blanks), count=count, existing=", ".join(options))
+        data, errors = ask_json(llm, prompt, schema, "distractors", "nirappugaa")
+        if errors:
+            raise ValueError("The missing options could not be generated: " + "; ".join(errors))
+        record("nirappugaa", repaired=1)
+        options += [word for word in data["words"] if word not in options][:count]
+    random.shuffle(options)
+    return options
+
 
 def generate_nirappugaa_exercise(api_key):
     """
     Generate a child-friendly 75-word passage with 2-3 blanks along with strong clues for each blank.
+
+    The reply is JSON checked against NIRAPPUGAA_SCHEMA. Missing clues and
+    options are asked for on their own rather than regenerating the whole
+    exercise; a reply without a usable passage and blanks raises ValueError.
     """
     # Use OpenAI API to generate the passage with blanks
-    llm = ChatOpenAI(
-        model_name="gpt-4o",
-        temperature=0.7,
-        openai_api_key=api_key
-    )
-    
-    prompt = """
-Generate a child-friendly passage in Tamil suitable for a 9-year-old child. The passage should be approximately 75 words, meaningful, and easy to understand for a 9-year-old kid.
-
-The passage must use only pure Tamil words, avoiding any English-based words and should be grammatically, politically correct.
-
-Select 3 important words from the passage that are appropriate to be turned into blanks for a fill-in-the-blanks exercise. Replace these words in the passage with "_________________________".
-The words should be **nouns, adjectives, or verbs** (but not proper nouns). The selected words should be **crucial to the overall meaning of the passage**.
-
-
-For each blank, provide a **clue** that will help a 9-year-old child identify the correct word. The clue should be **simple, contain 2 sentences**, and directly relate to the context of the blank word.
-
-Provide 6 different words as **options**, including the correct answers for the blanks. Ensure that the **correct answers are randomized** among the options.
-
-**Format**:
-Passage:
-[Your passage with blanks]
-
-Blanks:
-1. [Actual word for blank 1]
-2. [Actual word for blank 2]
-...
-
-Options:
-Option1, Option2, Option3, ...
-
-Clues:
-1. [Clue for blank 1]
-2. [Clue for blank 2]
-...
-"""
-    response = llm.predict(prompt)
-
-    # Debug: Print the raw LLM response to inspect
-    print("LLM Response:", response)
-
-    # Parse the response to extract the passage, blanks, clues, and options
-    lines = response.strip().split('\n')
-    passage_lines = []
-    blanks = []
-    clues = []
-    options = []
-
-    is_passage = False
-    is_blanks = False
-    is_clues = False
-    is_options = False
-
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        if line.lower().startswith('passage:'):
-            is_passage = True
-            is_blanks = False
-            is_clues = False
-            is_options = False
-            continue
-        elif line.lower().startswith('blanks:'):
-            is_passage = False
-            is_blanks = True
-            is_clues = False
-            is_options = False
-            continue
-        elif line.lower().startswith('options:'):
-            is_passage = False
-            is_blanks = False
-            is_clues = False
-            is_options = True
-            continue
-        elif line.lower().startswith('clues:'):
-            is_passage = False
-            is_blanks = False
-            is_clues = True
-            is_options = False
-            continue
-
-        if is_passage:
-            passage_lines.append(line)
-        elif is_blanks and '.' in line:
-            # Split by first occurrence of '.' and extract the word
-            try:
-                blanks.append(line.split('.', 1)[1].strip())
-            except IndexError:
-                print(f"Error parsing blank: {line}")  # Debug information for parsing issue
-        elif is_options:
-            # Split options by commas
-            options = [opt.strip() for opt in line.split(',')]
-        elif is_clues and '.' in line:
-            try:
-                clues.append(line.split('.', 1)[1].strip())
-            except IndexError:
-                print(f"Error parsing clue: {line}")  # Debug information for parsing issue
-
-    passage = '\n'.join(passage_lines).strip()
-
-    # Ensure that all components (passage, blanks, clues, options) are generated properly
-    if not passage or len(blanks) < 2 or len(clues) < 2 or len(options) < 6:
-        # Debug: Print the components for inspection if the ValueError is triggered
-        print("Passage Generated:", passage)
-        print("Blanks Generated:", blanks)
-        print("Clues Generated:", clues)
-        print("Options Generated:", options)
-        raise ValueError("The passage, blanks, clues, or options were not generated correctly. Please check the prompt or parsing logic.")
+    llm = get_chat_llm(model_name="gpt-4o", temperature=0.7, api_key=api_key, module="nirappugaa")
+    record("nirappugaa", exercises=1)
+    try:
+        data, errors = ask_json(llm, get_prompt("nirappugaa_exercise").template, NIRAPPUGAA_SCHEMA, "nirappugaa_exercise", "nirappugaa")
+        if data is None or any(error.startswith(("$:", "$.passage", "$.blanks")) for error in errors):
+            raise ValueError("The passage or blanks were not generated correctly: " + "; ".join(errors))
+
+        blanks = [word.strip() for word in data["blanks"]]
+        source_passage = data["passage"].strip()
+        passage = _mark_blanks(source_passage, blanks)
+        clues = [clue.strip() for clue in data.get("clues", []) if isinstance(clue, str) and clue.strip()]
+        if len(clues) < len(blanks):
+            clues = _repair_clues(llm, passage, blanks, clues)
+        clues = clues[:len(blanks)]
+        options = [option for option in data.get("options", []) if isinstance(option, str)]
+        options = _repair_options(llm, blanks, options)
+    except ValueError:
+        record("nirappugaa", failures=1)
+        raise
 
     # Construct the full exercise with passage, clues, and options for display to the child
     full_exercise = f"{passage}\n\nகுறிப்புகள்:\n" + "\n".join([f"{idx+1}. {clue}" for idx, clue in enumerate(clues)]) + "\n\nவிருப்பங்கள்:\n" + ", ".join(options)
 
-    return {'passage': full_exercise, 'blanks': blanks, 'options': options}
+    # The pool deduplicates on the generated passage; the rendered one has shuffled options
+    return {'passage': full_exercise, 'blanks': blanks, 'options': options, SOURCE_FIELD: source_passage}
+
+def next_nirappugaa_exercise(api_key):
+    """
+    Return a ready exercise from the pre-generated pool, refilling it in the background.
+    """
+    return get_exercise_pool("nirappugaa", generate_nirappugaa_exercise).pop(api_key)
 
 def validate_nirappugaa_answers(passage, blanks, user_answers, options):
     """
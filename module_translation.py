@@ -1,37 +1,26 @@
 # module_translation.py
 
-from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
-from langchain.chat_models import ChatOpenAI
+from utils.lexicon import lookup
+from utils.llm_factory import get_chain
+from utils.prompt_registry import get_prompt
+from utils.llm_metrics import record_lookup
 
-def setup_translation_chain() -> LLMChain:
-    llm = ChatOpenAI(
-        model_name="gpt-4o",
-        temperature=0.3,
-    )
-
-    prompt_template = """
-You are a friendly gender-neutral Tamil companion named வினவி who is an expert in helping out with tamil word translations for any given tamil word suitable for 9-year-old kids in Singapore explained in Tamil.
-
-Instructions:
-1. Translate the given English word/sentence into Tamil and mention that the given english word's translation is the respective translated word in tamil. If the given word is in tamil, then mention that the given tamil word's translation in English  is the respective translated word in English.
-2. Ensure the translation is accurate and suitable for a 9-year-old child.
-3. Avoid complex words and keep the language simple.
-4. Always check for and flag any abusive, misleading, or exploitative content.
-5. Also come up with tamil synonyms for the translated word by just mentioning the words alone only if feasible or leave it.
-
-Question: {question}
+prompt = get_prompt("translation").prompt
 
-Answer:
-    """
-    prompt = PromptTemplate(
-        input_variables=["question"],
-        template=prompt_template,
-    )
-
-    translation_chain = LLMChain(
-        llm=llm,
-        prompt=prompt,
-    )
-
-    return translation_chain
+def setup_translation_chain() -> LLMChain:
+    def build_chain(llm):
+        return LLMChain(
+            llm=llm,
+            prompt=prompt,
+        )
+
+    return get_chain("translation", build_chain, model_name="gpt-4o", temperature=0.3, streaming=True)
+
+def get_translation(question, callbacks=None):
+    """Answer from the reviewed lexicon when the word is in it, else ask the LLM."""
+    answer = lookup(question, "translation")
+    record_lookup("translation", "lexicon", answer is not None)
+    if answer is None:
+        answer = setup_translation_chain().run(question=question, callbacks=callbacks)
+    return answer
@@ -0,0 +1,55 @@
+# tests/test_content_filter.py
+
+import unicodedata
+
+import pytest
+
+from utils import content_filter
+from utils.content_filter import ModerationEngine
+from utils.moderation_cache import ModerationCache
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    cache_path = tmp_path_factory.mktemp("moderation") / "cache.sqlite"
+    return ModerationEngine(cache=ModerationCache(path=str(cache_path)))
+
+
+# Ordinary words a child might type that sound or look like a blocklisted term
+CHILDREN_WORDS = ["குட்டி", "குட்டி நாய்", "சொத்து", "குதி", "கொதி", "ஓட", "சுத்து", "heroine", "heroines",
+                  "kutti", "kuthi", "sothu"]
+
+
+@pytest.mark.parametrize("text", CHILDREN_WORDS)
+def test_ordinary_words_are_not_blocked(engine, text):
+    assert not engine.blocked(text)
+
+
+def test_ordinary_words_are_not_masked(engine, monkeypatch):
+    monkeypatch.setattr(content_filter, "_engine", engine)
+    text = "குட்டி நாய் குதி சொத்து"
+    assert content_filter.filter_inappropriate_content(text) == text
+
+
+@pytest.mark.parametrize("text", ["ஓத்தா", "நீ ஓத்தா", "தேவடியா!", unicodedata.normalize("NFD", "ஓத்தா")])
+def test_tamil_terms_match_exactly(engine, text):
+    assert engine.blocked(text)
+
+
+def test_tamil_terms_do_not_match_inside_longer_words(engine):
+    assert not engine.blocked("சூத்துவது")
+
+
+@pytest.mark.parametrize("text", ["oththaa", "otha", "dhevidiya", "thevidiyaku", "p u n d a"])
+def test_romanized_terms_match_by_sound(engine, text):
+    assert engine.blocked(text)
+
+
+@pytest.mark.parametrize("text", ["heroin", "sh1t", "kill yourself", "f.u.c.k"])
+def test_english_terms(engine, text):
+    assert engine.blocked(text)
+
+
+def test_allowlisted_word_is_never_matched_by_sound(engine, monkeypatch):
+    monkeypatch.setattr(engine, "allowed_words", engine.allowed_words | {"sunni"})
+    assert not engine.blocked("sunni")
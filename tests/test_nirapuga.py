@@ -0,0 +1,87 @@
+# tests/test_nirapuga.py
+
+import json
+
+import pytest
+
+import module_nirapuga
+from module_nirapuga import _mark_blanks, _repair_clues, _repair_options
+from utils import llm_metrics
+from utils.prompt_registry import BLANK, OPTION_COUNT
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch):
+    # Count in memory instead of appending to the metrics log
+    metrics = llm_metrics.LLMMetrics(path=None)
+    monkeypatch.setattr(llm_metrics, "_metrics", metrics)
+    return metrics
+
+
+class FakeLLM:
+    """Returns the queued replies in order and keeps the prompts it was sent."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def predict(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return self.replies.pop(0)
+
+
+def test_words_become_blanks_in_answer_order():
+    assert _mark_blanks("மரம் மேலே பறவை", ["மரம்", "பறவை"]) == f"{BLANK} மேலே {BLANK}"
+
+
+def test_existing_markers_are_normalized():
+    assert _mark_blanks("நான் ___ சாப்பிட்டேன் ______", ["பழம்", "நேற்று"]) == f"நான் {BLANK} சாப்பிட்டேன் {BLANK}"
+
+
+def test_word_inside_a_longer_word_is_not_blanked():
+    passage = _mark_blanks("பழம்பெரும் கோயிலில் ஒரு பழம் இருந்தது", ["பழம்"])
+    assert passage == f"பழம்பெரும் கோயிலில் ஒரு {BLANK} இருந்தது"
+
+
+def test_markers_and_words_are_mixed_in_order():
+    passage = _mark_blanks("___ நாய் ஓடியது, பூனை தூங்கியது", ["நாய்", "பூனை"])
+    assert passage == f"{BLANK} நாய் ஓடியது, {BLANK} தூங்கியது"
+
+
+def test_answer_missing_from_the_passage_raises():
+    with pytest.raises(ValueError):
+        _mark_blanks("மரம் மேலே பறவை", ["மரம்", "யானை"])
+
+
+def test_only_missing_clues_are_asked_for(metrics):
+    llm = FakeLLM(json.dumps({"clues": ["பறக்கும்", "extra"]}))
+    clues = _repair_clues(llm, f"{BLANK} மேலே {BLANK}", ["மரம்", "பறவை"], ["உயரமானது"])
+    assert clues == ["உயரமானது", "பறக்கும்"]
+    assert "Missing words: பறவை\n" in llm.prompts[0]
+    assert 'exercise_generation_total{event="repaired",kind="nirappugaa"} 1' in metrics.prometheus_text()
+
+
+def test_clue_repair_that_fails_validation_raises(metrics):
+    with pytest.raises(ValueError):
+        _repair_clues(FakeLLM(json.dumps({"clues": []})), BLANK, ["மரம்"], [])
+    text = metrics.prometheus_text()
+    assert 'exercise_generation_total{event="schema_failures",kind="nirappugaa"} 1' in text
+
+
+def test_options_include_every_answer_once():
+    options = _repair_options(FakeLLM(), ["மரம்"], ["மரம் ", "a", "b", "a", "c", "d", "e", ""])
+    assert sorted(options) == sorted(["மரம்", "a", "b", "c", "d", "e"])
+
+
+def test_only_missing_distractors_are_asked_for():
+    llm = FakeLLM(json.dumps({"words": ["a", "c", "d", "e", "f"]}))
+    options = _repair_options(llm, ["மரம்", "பறவை"], ["a", "b"])
+    assert len(options) == OPTION_COUNT
+    assert set(options) == {"மரம்", "பறவை", "a", "b", "c", "d"}
+    assert len(llm.prompts) == 1
+
+
+def test_unparseable_distractor_reply_raises(metrics):
+    with pytest.raises(ValueError):
+        _repair_options(FakeLLM("not json"), ["மரம்"], [])
+    assert 'exercise_generation_total{event="parse_failures",kind="nirappugaa"} 1' in metrics.prometheus_text()
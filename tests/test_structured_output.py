@@ -0,0 +1,41 @@
+# tests/test_structured_output.py
+
+import pytest
+
+from utils.structured_output import parse_json, validate
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "passage": {"type": "string", "minLength": 1},
+        "blanks": {"type": "array", "items": {"type": "string", "minLength": 1}, "minItems": 2, "maxItems": 3},
+        "count": {"type": "integer"},
+    },
+    "required": ["passage", "blanks"],
+}
+
+
+def test_valid_data_has_no_errors():
+    assert validate({"passage": "மரம்", "blanks": ["a", "b"], "count": 2}, SCHEMA) == []
+
+
+@pytest.mark.parametrize("data, error", [
+    ([], "$: expected object"),
+    ({"blanks": ["a", "b"]}, "$.passage: missing"),
+    ({"passage": "  ", "blanks": ["a", "b"]}, "$.passage: too short"),
+    ({"passage": "x", "blanks": ["a"]}, "$.blanks: expected at least 2 items, got 1"),
+    ({"passage": "x", "blanks": ["a", "b", "c", "d"]}, "$.blanks: expected at most 3 items, got 4"),
+    ({"passage": "x", "blanks": ["a", 1]}, "$.blanks[1]: expected string"),
+    ({"passage": "x", "blanks": ["a", "b"], "count": True}, "$.count: expected integer"),
+])
+def test_violations_are_reported_with_their_path(data, error):
+    assert validate(data, SCHEMA) == [error]
+
+
+def test_json_is_found_inside_code_fences():
+    assert parse_json('```json\n{"a": 1}\n```') == {"a": 1}
+
+
+def test_reply_without_json_raises():
+    with pytest.raises(ValueError):
+        parse_json("no json here")
@@ -0,0 +1,99 @@
+# utils/chunking.py
+
+import os
+import re
+import unicodedata
+
+DEFAULT_CHUNK_SIZE = 200
+DEFAULT_CHUNK_OVERLAP = 40
+
+_UNIT = re.compile(r"unit[ _-]?(\d+)", re.IGNORECASE)
+_indic_loaded = False
+
+
+def graphemes(text):
+    """
+    Split text into user-perceived characters.
+
+    A Tamil letter such as கொ or க் is a base character followed by vowel
+    signs or a virama, which are combining marks; they stay with their base.
+    """
+    clusters = []
+    for char in text:
+        if clusters and unicodedata.category(char) in ("Mn", "Mc"):
+            clusters[-1] += char
+        else:
+            clusters.append(char)
+    return clusters
+
+
+def split_sentences(text):
+    """Split text into sentences line by line with the Indic NLP sentence tokenizer."""
+    global _indic_loaded
+    from indicnlp.tokenize import sentence_tokenize
+
+    if not _indic_loaded:
+        # The Tamil splitter works without the resources folder; load it when configured
+        resources_path = os.getenv("INDIC_RESOURCES_PATH")
+        if resources_path:
+            from indicnlp import common, loader
+            common.set_resources_path(resources_path)
+            loader.load()
+        _indic_loaded = True
+
+    sentences = []
+    for line in text.splitlines():
+        if line.strip():
+            sentences.extend(s.strip() for s in sentence_tokenize.sentence_split(line, lang='ta') if s.strip())
+    return sentences
+
+
+def chunk_sentences(sentences, chunk_size=DEFAULT_CHUNK_SIZE, chunk_overlap=DEFAULT_CHUNK_OVERLAP):
+    """
+    Pack sentences into chunks of at most chunk_size graphemes.
+
+    Each chunk starts with the trailing sentences of the previous one, up to
+    chunk_overlap graphemes. A sentence longer than chunk_size is cut into
+    windows of chunk_size graphemes that overlap by chunk_overlap.
+    """
+    chunks = []
+    current, current_len = [], 0
+    for sentence in sentences:
+        length = len(graphemes(sentence))
+        if length > chunk_size:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_len = [], 0
+            clusters = graphemes(sentence)
+            step = max(1, chunk_size - chunk_overlap)
+            for start in range(0, len(clusters), step):
+                chunks.append("".join(clusters[start:start + chunk_size]))
+                if start + chunk_size >= len(clusters):
+                    break
+            continue
+        if current and current_len + 1 + length > chunk_size:
+            chunks.append(" ".join(current))
+            # Carry the tail of the finished chunk over as overlap
+            carried, carried_len = [], 0
+            for previous in reversed(current):
+                previous_len = len(graphemes(previous))
+                if carried_len + previous_len > chunk_overlap or carried_len + previous_len + 1 + length > chunk_size:
+                    break
+                carried.insert(0, previous)
+                carried_len += previous_len + 1
+            current, current_len = carried, carried_len
+        current.append(sentence)
+        current_len += length + (1 if current_len else 0)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunk_text(text, chunk_size=DEFAULT_CHUNK_SIZE, chunk_overlap=DEFAULT_CHUNK_OVERLAP):
+    return chunk_sentences(split_sentences(text), chunk_size, chunk_overlap)
+
+
+def unit_from_path(path):
+    """Textbook unit number from a file name such as unit10.txt, or None."""
+    match = _UNIT.search(os.path.basename(path))
+    return int(match.group(1)) if match else None
@@ -1,4 +1,427 @@
 # utils/content_filter.py
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain.callbacks import get_openai_callback
+
+from utils.lexical_index import tokenize
+from utils.llm_factory import get_chat_llm
+from utils.llm_metrics import record_cache_hit, record_count
+from utils.moderation_cache import ModerationCache
+from utils.moderation_classifier import NaiveBayesClassifier
+from utils.prompt_registry import MODERATION_POLICY, get_prompt
+from utils.tamil_text import normalize_text, phonetic_key
+
+logger = logging.getLogger(__name__)
+
+BLOCKLIST_PATH = "data/moderation/blocklist.txt"
+# Romanized spellings of Tamil terms, matched by phonetic_key against Latin-script words
+ROMANIZED_BLOCKLIST_PATH = "data/moderation/blocklist_romanized.txt"
+ALLOWLIST_PATH = "data/moderation/allowlist.txt"
+# Every word in the textbook is fit for the children reading it
+ALLOWLIST_SOURCES = ("data/data_cleaned.txt",)
+# Longer inputs can say something unsafe with safe words, so they go to the next tier
+ALLOW_MAX_WORDS = 3
+# The classifier decides only when it is this sure either way
+CLASSIFIER_CLEAN_BELOW = 0.02
+CLASSIFIER_FLAG_ABOVE = 0.98
+TIERS = ("blocklist", "allowlist", "classifier", "cache", "llm")
+# Generate the answer while the LLM moderates; set to 0 to moderate first
+SPECULATIVE_MODERATION = os.getenv("SPECULATIVE_MODERATION", "1") != "0"
+SPECULATIVE_WORKERS = 8
+# Set to a path to record LLM verdicts as training data for the classifier
+LABEL_LOG_PATH = os.getenv("MODERATION_LABEL_LOG")
+
+moderation_prompt = get_prompt("moderation").prompt
+batch_moderation_prompt = get_prompt("moderation_batch").prompt
+
+# Cached verdicts are only reused under the policy that produced them; the
+# single and batch prompts apply the same policy and share verdicts
+MODERATION_PROMPT_VERSION = hashlib.sha256(MODERATION_POLICY.encode("utf-8")).hexdigest()[:12]
+# Inputs per batched LLM call
+BATCH_MODERATION_SIZE = 20
+
+_LATIN_WORD = re.compile(r"[a-z0-9@$!*]+")
+# Characters typed in place of a letter; "@" and "*" may stand for any vowel
+_SUBSTITUTES = {
+    "a": "a4@*", "e": "e3@*", "i": "i1!@*", "o": "o0@*", "u": "u@*", "s": "s5$", "t": "t7",
+}
+_TAMIL = re.compile(r"[\u0b80-\u0bff]")
+_TAMIL_WORD = re.compile(r"[\u0b80-\u0bff]+")
+# Romanized Tamil words are often inflected (thevidiyaku), so keys this
+# long also match as a prefix; shorter ones would catch ordinary words
+_PHONETIC_PREFIX_MIN = 7
+# "-es" is only an English ending after these, so "heroines" is not "heroin" + "es"
+_SIBILANT_ENDINGS = ("s", "x", "z", "ch", "sh")
+
+
+def _read_terms(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [normalize_text(line) for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _english_pattern(word):
+    """Regex for a blocklisted English word, its common endings and symbol spellings."""
+    letters = "".join(f"[{re.escape(_SUBSTITUTES.get(char, char))}]" for char in word)
+    endings = "s|es|ed|er|ers|ing|y" if word.endswith(_SIBILANT_ENDINGS) else "s|ed|er|ers|ing|y"
+    return re.compile(f"{letters}(?:{endings})?")
+
+
+def _latin_words(text):
+    """Latin-script words of text, with s p a c e d or d.o.t.t.e.d letters joined back up."""
+    words, letters = [], []
+    for word in _LATIN_WORD.findall(normalize_text(text)) + [""]:
+        if len(word) == 1:
+            letters.append(word)
+            continue
+        if len(letters) > 1:
+            words.append("".join(letters))
+        else:
+            words.extend(letters)
+        letters = []
+        if word:
+            words.append(word)
+    return words
+
+
+class ModerationEngine:
+    """
+    Decide whether input is fit for a child, from the cheapest tier that can.
+
+    1. Blocklist: curated English and Tamil terms. Tamil-script input is
+       matched against the Tamil terms exactly; Latin-script words that
+       are not allowlisted are also matched by sound against the Tamil
+       terms and their romanized spellings. A hit is flagged.
+    2. Allowlist: short inputs made only of allowed or textbook words pass.
+    3. Classifier: a local naive Bayes model decides when it is confident.
+    4. Cache, then the LLM: everything else, with the verdict cached.
+
+    tier_stats() reports how many checks each tier answered.
+    """
+
+    def __init__(self, blocklist_path=BLOCKLIST_PATH, allowlist_path=ALLOWLIST_PATH,
+                 allowlist_sources=ALLOWLIST_SOURCES, classifier=None, cache=None,
+                 romanized_blocklist_path=ROMANIZED_BLOCKLIST_PATH):
+        self.english_terms = []
+        self.tamil_terms = []
+        self.romanized_keys = []
+        for term in _read_terms(blocklist_path):
+            if _TAMIL.search(term):
+                self.tamil_terms.append(term.split())
+                self.romanized_keys.append([phonetic_key(word) for word in term.split()])
+            else:
+                self.english_terms.append([_english_pattern(word) for word in term.split()])
+        for term in _read_terms(romanized_blocklist_path):
+            self.romanized_keys.append([phonetic_key(word) for word in term.split()])
+        self.allowed_words = set()
+        for term in _read_terms(allowlist_path):
+            self.allowed_words.update(tokenize(term))
+        for path in allowlist_sources:
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self.allowed_words.update(tokenize(f.read()))
+        self.classifier = classifier if classifier is not None else NaiveBayesClassifier.load()
+        self.cache = cache or ModerationCache()
+        self.counts = dict.fromkeys(TIERS, 0)
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, tier, count=1):
+        with self._lock:
+            self.counts[tier] += count
+        record_count("moderation_checks", count, tier=tier)
+
+    @staticmethod
+    def _sequence_matches(words, term, word_matches):
+        for start in range(len(words) - len(term) + 1):
+            if all(word_matches(words[start + i], part) for i, part in enumerate(term)):
+                return True
+        return False
+
+    @staticmethod
+    def _key_matches(key, part):
+        return key is not None and (key == part or (len(part) >= _PHONETIC_PREFIX_MIN and key.startswith(part)))
+
+    def blocked(self, text):
+        """True if text contains a blocklisted term."""
+        tamil_words = _TAMIL_WORD.findall(normalize_text(text))
+        for term in self.tamil_terms:
+            if self._sequence_matches(tamil_words, term, str.__eq__):
+                return True
+        words = _latin_words(text)
+        for term in self.english_terms:
+            if self._sequence_matches(words, term, lambda word, pattern: pattern.fullmatch(word)):
+                return True
+        # Allowed words are real words that merely sound like a term, so they never match by sound
+        keys = [None if word in self.allowed_words else phonetic_key(word) for word in words]
+        for term in self.romanized_keys:
+            if self._sequence_matches(keys, term, self._key_matches):
+                return True
+        return False
+
+    def allowed(self, text):
+        """True if text is a few words that are all allowlisted or from the textbook."""
+        words = tokenize(text)
+        return 0 < len(words) <= ALLOW_MAX_WORDS and all(word in self.allowed_words for word in words)
+
+    def local_verdict(self, text):
+        """(flagged, tier) from the local tiers, or (None, None) if the text needs the LLM."""
+        if self.blocked(text):
+            return True, "blocklist"
+        if not tokenize(text) or self.allowed(text):
+            return False, "allowlist"
+        if self.classifier is not None:
+            probability = self.classifier.flagged_probability(text)
+            if probability is not None and probability < CLASSIFIER_CLEAN_BELOW:
+                return False, "classifier"
+            if probability is not None and probability > CLASSIFIER_FLAG_ABOVE:
+                return True, "classifier"
+        return None, None
+
+    def quick_verdict(self, text):
+        """(flagged, tier) from the local tiers or the cache, or (None, None) if only the LLM can tell."""
+        flagged, tier = self.local_verdict(text)
+        if tier is None:
+            flagged = self.cache.get(MODERATION_PROMPT_VERSION, text)
+            tier = None
+            if flagged is not None:
+                tier = "cache"
+                record_cache_hit("moderation", "moderation_cache")
+        return flagged, tier
+
+    def llm_verdict(self, text, api_key=None):
+        """Ask the LLM and cache its verdict."""
+        flagged = self._ask_llm(text, api_key)
+        self.cache.put(MODERATION_PROMPT_VERSION, text, flagged)
+        self._log_label(text, flagged)
+        return flagged
+
+    def moderate(self, text, api_key=None):
+        """Return (flagged, tier) for text."""
+        flagged, tier = self.quick_verdict(text)
+        if tier is None:
+            flagged, tier = self.llm_verdict(text, api_key), "llm"
+        self.record(tier)
+        return flagged, tier
+
+    def moderate_many(self, texts, api_key=None):
+        """
+        Return (flagged, tier) for each text, asking the LLM about the undecided ones together.
+
+        Texts equal after normalization are judged once. Up to
+        BATCH_MODERATION_SIZE undecided texts share one LLM call.
+        """
+        verdicts = {}
+        for text in texts:
+            key = normalize_text(text)
+            if key not in verdicts:
+                verdicts[key] = (text, *self.local_verdict(text))
+        undecided = [key for key, (_, _, tier) in verdicts.items() if tier is None]
+        cached = self.cache.get_many(MODERATION_PROMPT_VERSION, undecided)
+        for key, flagged in zip(undecided, cached):
+            if flagged is not None:
+                verdicts[key] = (verdicts[key][0], flagged, "cache")
+                record_cache_hit("moderation", "moderation_cache")
+        undecided = [key for key in undecided if verdicts[key][2] is None]
+        for start in range(0, len(undecided), BATCH_MODERATION_SIZE):
+            keys = undecided[start:start + BATCH_MODERATION_SIZE]
+            batch = [verdicts[key][0] for key in keys]
+            for key, text, flagged in zip(keys, batch, self._ask_llm_batch(batch, api_key)):
+                verdicts[key] = (text, flagged, "llm")
+                self._log_label(text, flagged)
+            self.cache.put_many(MODERATION_PROMPT_VERSION, batch, [verdicts[key][1] for key in keys])
+        for _, _, tier in verdicts.values():
+            self.record(tier)
+        return [verdicts[normalize_text(text)][1:] for text in texts]
+
+    def _moderation_llm(self, max_tokens, api_key=None):
+        with self._lock:
+            self.llm_calls += 1
+        return get_chat_llm(
+            model_name="gpt-4o", temperature=0.0, max_tokens=max_tokens, api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            module="moderation",
+        )
+
+    def _ask_llm(self, text, api_key=None):
+        moderation_llm = self._moderation_llm(5, api_key)
+        response = moderation_llm.predict(moderation_prompt.format(user_input=text)).strip().lower()
+        return response.startswith('yes')
+
+    def _ask_llm_batch(self, texts, api_key=None):
+        """One call for several texts; falls back to one call each if the reply does not parse."""
+        if len(texts) == 1:
+            return [self._ask_llm(texts[0], api_key)]
+        # Each input is JSON-quoted so it cannot break out of its numbered line
+        items = "\n".join(f"{i}. {json.dumps(text, ensure_ascii=False)}" for i, text in enumerate(texts, 1))
+        moderation_llm = self._moderation_llm(8 * len(texts) + 10, api_key)
+        response = moderation_llm.predict(batch_moderation_prompt.format(count=len(texts), items=items))
+        try:
+            answers = json.loads(response[response.index("["):response.rindex("]") + 1])
+            if len(answers) != len(texts):
+                raise ValueError(f"expected {len(texts)} verdicts, got {len(answers)}")
+            return [str(answer).strip().lower().startswith("yes") for answer in answers]
+        except ValueError as e:
+            logger.warning("Unparseable batch moderation reply (%s); checking items one by one", e)
+            return [self._ask_llm(text, api_key) for text in texts]
+
+    def _log_label(self, text, flagged):
+        if LABEL_LOG_PATH:
+            with self._lock, open(LABEL_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"text": text, "flagged": flagged}, ensure_ascii=False) + "\n")
+
+    def tier_stats(self):
+        """Checks answered per tier and as a fraction of all checks, and LLM round trips actually made."""
+        with self._lock:
+            counts = dict(self.counts)
+            llm_calls = self.llm_calls
+        total = sum(counts.values())
+        return {
+            "checks": total,
+            "counts": counts,
+            "fractions": {tier: count / total if total else 0.0 for tier, count in counts.items()},
+            "llm_calls": llm_calls,
+            "llm_calls_saved": total - llm_calls,
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+_executor = None
+_speculation = {"runs": 0, "discarded": 0, "discarded_tokens": 0}
+_speculation_lock = threading.Lock()
+
+
+def get_moderation_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ModerationEngine()
+    return _engine
+
+
+def moderate_content(user_input, api_key=None):
+    """
+    Check whether user input is inappropriate for a 9-year-old child.
+
+    Args:
+        user_input (str): The text to check.
+        api_key (str): OpenAI API key. Defaults to OPENAI_API_KEY.
+
+    Returns:
+        bool: True if the input should be blocked.
+    """
+    return get_moderation_engine().moderate(user_input, api_key)[0]
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _engine_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="speculative")
+    return _executor
+
+
+def _generate_counted(generate):
+    with get_openai_callback() as usage:
+        answer = generate()
+    return answer, usage.total_tokens
+
+
+def _record_discarded(future):
+    if future.cancelled() or future.exception() is not None:
+        tokens = 0
+    else:
+        tokens = future.result()[1]
+    with _speculation_lock:
+        _speculation["discarded_tokens"] += tokens
+    record_count("moderation_discarded_tokens", tokens)
+    logger.info("Discarded a speculative answer to flagged input (%d tokens)", tokens)
+
+
+def moderate_and_answer(user_input, generate, api_key=None, speculative=SPECULATIVE_MODERATION, wait=None):
+    """
+    Moderate user input and produce the answer, overlapping the two LLM calls.
+
+    When the local tiers or the cache decide, nothing is overlapped: flagged
+    input is refused and clean input goes straight to generate(). Otherwise
+    generate() starts in a worker thread while the LLM moderates. The answer
+    is only returned once moderation passes; for flagged input it is thrown
+    away and the tokens it spent are logged.
+
+    generate must not touch Streamlit session state; it runs off the script thread.
+
+    Args:
+        user_input (str): The text to check.
+        generate (callable): Produces the answer, e.g. lambda: get_meaning(user_input).
+        api_key (str): OpenAI API key. Defaults to OPENAI_API_KEY.
+        speculative (bool): Overlap the calls; False moderates first, as before.
+        wait (callable): Called with the answer's future once moderation passes and
+            returns its result, e.g. utils.streaming.StreamingAnswer.wait to show
+            the tokens generated so far. Defaults to blocking on the future.
+
+    Returns:
+        tuple[bool, str | None]: (flagged, answer); answer is None when flagged.
+    """
+    engine = get_moderation_engine()
+    flagged, tier = engine.quick_verdict(user_input)
+    if tier is None and not speculative:
+        flagged, tier = engine.llm_verdict(user_input, api_key), "llm"
+    if tier is not None:
+        engine.record(tier)
+        return (True, None) if flagged else (False, generate())
+
+    answer_future = _get_executor().submit(_generate_counted, generate)
+    try:
+        flagged = engine.llm_verdict(user_input, api_key)
+    except Exception:
+        answer_future.cancel()
+        raise
+    engine.record("llm")
+    with _speculation_lock:
+        _speculation["runs"] += 1
+        _speculation["discarded"] += int(flagged)
+    record_count("moderation_speculative_answers", outcome="discarded" if flagged else "kept")
+    if flagged:
+        if not answer_future.cancel():
+            answer_future.add_done_callback(_record_discarded)
+        return True, None
+    return False, (wait or Future.result)(answer_future)[0]
+
+
+def moderate_batch(texts, api_key=None):
+    """
+    Check several inputs at once, e.g. every answer in one exercise submission.
+
+    Inputs the local tiers or the cache cannot decide are judged together
+    in a single LLM call, so a three-blank submission costs at most one
+    round trip.
+
+    Args:
+        texts (list[str]): The texts to check.
+        api_key (str): OpenAI API key. Defaults to OPENAI_API_KEY.
+
+    Returns:
+        list[bool]: True for each text that should be blocked, in input order.
+    """
+    return [flagged for flagged, _ in get_moderation_engine().moderate_many(texts, api_key)]
+
+
+def moderation_stats():
+    engine = get_moderation_engine()
+    with _speculation_lock:
+        speculation = dict(_speculation)
+    return {"tiers": engine.tier_stats(), "cache": engine.cache.stats(), "speculation": speculation}
+
+
 def filter_inappropriate_content(text):
     """
     Filter and sanitize text to ensure it is age-appropriate.
@@ -7,10 +430,7 @@ def filter_inappropriate_content(text):
         text (str): The input text.
 
     Returns:
-        str: The filtered and sanitized text.
+        str: The text with every blocklisted word replaced by asterisks.
     """
-    # Implement basic content filtering logic
-    inappropriate_words = ["badword1", "badword2"]  # Example list of words to filter
-    for word in inappropriate_words:
-        text = text.replace(word, "****")
-    return text
\ No newline at end of file
+    engine = get_moderation_engine()
+    return " ".join("****" if engine.blocked(word) else word for word in text.split(" "))
@@ -0,0 +1,101 @@
+# utils/context_packer.py
+
+import logging
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import tiktoken
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.schema import BaseRetriever, Document
+
+from utils.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# A chunk whose words are at least this much contained in an already
+# packed chunk adds nothing new and is dropped
+OVERLAP_THRESHOLD = 0.8
+# Relevance below which a chunk is left out, on langchain's FAISS scale
+# (1 - squared L2 / sqrt 2, i.e. 1 - sqrt 2 * (1 - cosine) for ada-002).
+# The least related pair of chunks in data/vectorstore_med scores 0.70 and
+# the median pair 0.82, so a query must look at least as related to a
+# chunk as any two textbook chunks do to each other. Recalibrate with
+# python -m utils.retrieval_benchmark --calibrate --live.
+SCORE_THRESHOLD = 0.7
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name):
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model_name="gpt-4o"):
+    return len(get_encoding(model_name).encode(text))
+
+
+def _overlaps(words, packed_words):
+    if not words:
+        return True
+    return any(len(words & other) / len(words) >= OVERLAP_THRESHOLD for other in packed_words)
+
+
+def pack_documents(scored_docs, token_budget, score_threshold=None, model_name="gpt-4o"):
+    """
+    Choose which retrieved chunks go into a "stuff" prompt.
+
+    Args:
+        scored_docs (list[tuple[Document, float]]): Chunks with relevance scores in [0, 1].
+        token_budget (int): Maximum total tokens of the packed chunks.
+        score_threshold (float | None): Drop chunks scoring below this, except
+            the best one, so the prompt never gets an empty context.
+        model_name (str): Model whose tokenizer measures the budget.
+
+    Returns:
+        list[Document]: The most relevant non-overlapping chunks that fit the budget.
+    """
+    packed, packed_words = [], []
+    used = 0
+    for doc, score in sorted(scored_docs, key=lambda item: item[1], reverse=True):
+        if score_threshold is not None and score < score_threshold and packed:
+            break
+        words = set(tokenize(doc.page_content))
+        if _overlaps(words, packed_words):
+            continue
+        tokens = count_tokens(doc.page_content, model_name)
+        if used + tokens > token_budget:
+            # A shorter, less relevant chunk may still fit
+            continue
+        packed.append(doc)
+        packed_words.append(words)
+        used += tokens
+    logger.debug("Packed %d of %d chunks into %d tokens", len(packed), len(scored_docs), used)
+    return packed
+
+
+class ContextPacker(BaseRetriever):
+    """
+    Retriever that scores candidates, applies a similarity cutoff and packs them into a token budget.
+
+    `base` is either an object with scored_documents(query, k), such as
+    utils.lexical_index.HybridRetriever, or a vector store supporting
+    similarity_search_with_relevance_scores.
+    """
+
+    base: Any
+    k: int = 4
+    score_threshold: Optional[float] = SCORE_THRESHOLD
+    token_budget: int = 600
+    model_name: str = "gpt-4o"
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        if hasattr(self.base, "scored_documents"):
+            scored = self.base.scored_documents(query, k=self.k)
+        else:
+            scored = self.base.similarity_search_with_relevance_scores(query, k=self.k)
+        return pack_documents(scored, self.token_budget, self.score_threshold, self.model_name)
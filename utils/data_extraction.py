@@ -1,14 +1,84 @@
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import PyPDF2
 
-def extract_text_from_pdf(pdf_path):
-    text = ""
+PAGE_CACHE_DIR = "data/page_cache"
+PAGES_PER_TASK = 8
+
+
+def pdf_hash(pdf_path):
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _page_cache_path(digest, page_number):
+    return os.path.join(PAGE_CACHE_DIR, digest, f"{page_number}.txt")
+
+
+def _extract_pages(pdf_path, digest, page_numbers):
+    """Worker: extract a run of pages, caching each page's text by PDF hash and page number."""
+    pages = []
     with open(pdf_path, 'rb') as file:
         reader = PyPDF2.PdfReader(file)
-        for page in reader.pages:
-            text += page.extract_text()
-    return text
+        for page_number in page_numbers:
+            cache_path = _page_cache_path(digest, page_number)
+            if os.path.exists(cache_path):
+                with open(cache_path, encoding='utf-8') as f:
+                    pages.append((page_number, f.read()))
+                continue
+            text = reader.pages[page_number].extract_text() or ""
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(cache_path + ".tmp", cache_path)
+            pages.append((page_number, text))
+    return pages
+
+
+def iter_pdf_pages(pdf_paths, max_workers=None):
+    """
+    Yield (pdf_path, page_number, text) for every page, in document and page order.
+
+    Pages are extracted in a process pool, PAGES_PER_TASK at a time, and
+    pages already in the page cache are read back instead of re-extracted.
+    At most two tasks per worker are in flight, so memory stays bounded no
+    matter how many PDFs are passed.
+    """
+    tasks = []
+    for pdf_path in pdf_paths:
+        digest = pdf_hash(pdf_path)
+        with open(pdf_path, 'rb') as file:
+            page_count = len(PyPDF2.PdfReader(file).pages)
+        for start in range(0, page_count, PAGES_PER_TASK):
+            tasks.append((pdf_path, digest, range(start, min(start + PAGES_PER_TASK, page_count))))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        remaining = iter(tasks)
+        for task in remaining:
+            pending.append((task[0], pool.submit(_extract_pages, *task)))
+            if len(pending) >= 2 * max_workers:
+                break
+        while pending:
+            pdf_path, future = pending.popleft()
+            for page_number, text in future.result():
+                yield pdf_path, page_number, text
+            task = next(remaining, None)
+            if task is not None:
+                pending.append((task[0], pool.submit(_extract_pages, *task)))
+
+
+def extract_text_from_pdf(pdf_path):
+    return "".join(text for _, _, text in iter_pdf_pages([pdf_path]))
 
 if __name__ == "__main__":
-    pdf_text = extract_text_from_pdf('data/unit10.pdf')
     with open('data/unit10.txt', 'w', encoding='utf-8') as f:
-        f.write(pdf_text)
\ No newline at end of file
+        for _, _, page_text in iter_pdf_pages(['data/unit10.pdf']):
+            f.write(page_text)
@@ -0,0 +1,142 @@
+# utils/docstore.py
+
+import argparse
+import json
+import mmap
+import os
+import pickle
+from collections.abc import Mapping
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain.docstore.base import Docstore
+from langchain.docstore.document import Document
+
+OFFSETS_NAME = "docstore.offsets.npy"
+BLOB_NAME = "docstore.blob"
+
+# Each row stores three UTF-8 fields back to back in the blob: the docstore
+# id, the page content and the metadata as JSON. Field k of row i spans
+# blob[offsets[3 * i + k]:offsets[3 * i + k + 1]].
+FIELDS = 3
+
+
+def has_mmap_docstore(store_path):
+    return all(os.path.exists(os.path.join(store_path, name)) for name in (OFFSETS_NAME, BLOB_NAME))
+
+
+def write_docstore(vectorstore, store_path):
+    """Write the docstore of a FAISS vector store in the columnar format, in index order."""
+    blob_path = os.path.join(store_path, BLOB_NAME)
+    offsets_path = os.path.join(store_path, OFFSETS_NAME)
+    offsets = [0]
+    with open(blob_path + ".tmp", "wb") as blob:
+        for position in range(vectorstore.index.ntotal):
+            doc_id = vectorstore.index_to_docstore_id[position]
+            doc = vectorstore.docstore.search(doc_id)
+            for field in (doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)):
+                data = field.encode("utf-8")
+                blob.write(data)
+                offsets.append(offsets[-1] + len(data))
+    with open(offsets_path + ".tmp", "wb") as f:
+        np.save(f, np.asarray(offsets, dtype=np.int64))
+    os.replace(blob_path + ".tmp", blob_path)
+    os.replace(offsets_path + ".tmp", offsets_path)
+
+
+class ReadOnlyDocstoreError(RuntimeError):
+    """Raised when something tries to change a memory-mapped docstore."""
+
+
+class MmapDocstore(Docstore):
+    """
+    Read-only docstore over the columnar files written by write_docstore.
+
+    Only the ids are decoded up front; page content and metadata are read
+    from the memory-mapped blob for the rows a search returns.
+    """
+
+    def __init__(self, store_path):
+        self.offsets = np.load(os.path.join(store_path, OFFSETS_NAME), mmap_mode="r", allow_pickle=False)
+        with open(os.path.join(store_path, BLOB_NAME), "rb") as f:
+            # mmap cannot map an empty file
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        self.size = (len(self.offsets) - 1) // FIELDS
+        self.ids = [self._field(row, 0) for row in range(self.size)]
+        self.row_by_id = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def _field(self, row, field):
+        start = int(self.offsets[FIELDS * row + field])
+        end = int(self.offsets[FIELDS * row + field + 1])
+        return self.blob[start:end].decode("utf-8")
+
+    def document(self, row):
+        return Document(page_content=self._field(row, 1), metadata=json.loads(self._field(row, 2)))
+
+    def search(self, search):
+        row = self.row_by_id.get(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self.document(row)
+
+    def add(self, texts):
+        raise ReadOnlyDocstoreError("MmapDocstore is read-only; update stores with utils.ingest.")
+
+    def delete(self, ids):
+        raise ReadOnlyDocstoreError("MmapDocstore is read-only; update stores with utils.ingest.")
+
+
+class RowIds(Mapping):
+    """index_to_docstore_id view backed by the docstore's id column."""
+
+    def __init__(self, docstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.docstore.size:
+            raise KeyError(position)
+        return self.docstore.ids[position]
+
+    def __iter__(self):
+        return iter(range(self.docstore.size))
+
+    def __len__(self):
+        return self.docstore.size
+
+
+def load_docstore(store_path):
+    """Return (docstore, index_to_docstore_id) for a store in the columnar format."""
+    docstore = MmapDocstore(store_path)
+    return docstore, RowIds(docstore)
+
+
+def convert_store(store_path):
+    """
+    Write the columnar docstore for an existing store from its index.pkl.
+
+    index.pkl is still unpickled here, so only run this on stores we built.
+    """
+    with open(os.path.join(store_path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    index = faiss.read_index(os.path.join(store_path, "index.faiss"))
+    vectorstore = FAISS(
+        embedding_function=None,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+    write_docstore(vectorstore, store_path)
+    return index.ntotal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickled FAISS docstores to the memory-mapped format.")
+    parser.add_argument("stores", nargs="+", help="Vector store directories, e.g. data/vectorstore_med")
+    args = parser.parse_args()
+    for store_path in args.stores:
+        print(f"{store_path}: converted {convert_store(store_path)} documents")
+
+
+if __name__ == "__main__":
+    main()
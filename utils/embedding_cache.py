@@ -0,0 +1,203 @@
+# utils/embedding_cache.py
+
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from utils.tamil_text import text_hash
+
+DEFAULT_CACHE_DIR = "data/embedding_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model, normalized text hash).
+
+    Row metadata lives in SQLite; the vectors themselves are appended to one
+    float32 file per dimension and read back through a memory map.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                   model TEXT NOT NULL,
+                   text_hash TEXT NOT NULL,
+                   dim INTEGER NOT NULL,
+                   row INTEGER NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (model, text_hash)
+               )"""
+        )
+        self._db.commit()
+        self._maps = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _vector_file(self, dim):
+        return os.path.join(self.cache_dir, f"vectors_{dim}.f32")
+
+    def _vectors(self, dim):
+        """Memory-mapped (rows, dim) view of the vector file, reopened after appends."""
+        path = self._vector_file(dim)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        cached = self._maps.get(dim)
+        if cached is None or cached[0] != size:
+            rows = size // (4 * dim)
+            vectors = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dim)) if rows else np.empty((0, dim), np.float32)
+            cached = (size, vectors)
+            self._maps[dim] = cached
+        return cached[1]
+
+    def _lookup(self, model, hashes):
+        """Map each cached hash to its (dim, row)."""
+        located = {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT text_hash, dim, row FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                [model, *chunk],
+            )
+            for h, dim, row in rows:
+                located[h] = (dim, row)
+        return located
+
+    def get_many(self, model, texts):
+        """Return a list with the cached vector for each text, or None on a miss."""
+        hashes = [text_hash(text) for text in texts]
+        with self._lock:
+            found = {h: self._vectors(dim)[row].tolist() for h, (dim, row) in self._lookup(model, hashes).items()}
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._db.commit()
+            results = [found.get(h) for h in hashes]
+            hit_count = sum(result is not None for result in results)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model, texts, vectors):
+        """Store vectors for texts, skipping ones that are already cached."""
+        if not texts:
+            return
+        now = time.time()
+        with self._lock:
+            by_dim = {}
+            for text, vector in zip(texts, vectors):
+                by_dim.setdefault(len(vector), {})[text_hash(text)] = vector
+            for dim, items in by_dim.items():
+                existing = self._lookup(model, list(items))
+                new_items = [(h, v) for h, v in items.items() if h not in existing]
+                if not new_items:
+                    continue
+                path = self._vector_file(dim)
+                first_row = (os.path.getsize(path) if os.path.exists(path) else 0) // (4 * dim)
+                with open(path, "ab") as f:
+                    f.write(np.asarray([v for _, v in new_items], dtype=np.float32).tobytes())
+                self._db.executemany(
+                    "INSERT INTO embeddings (model, text_hash, dim, row, last_used) VALUES (?, ?, ?, ?, ?)",
+                    [(model, h, dim, first_row + i, now) for i, (h, _) in enumerate(new_items)],
+                )
+            self._db.commit()
+            if self._total_bytes() > self.max_bytes:
+                self._evict()
+
+    def _total_bytes(self):
+        return sum(
+            os.path.getsize(os.path.join(self.cache_dir, name))
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(".f32")
+        )
+
+    def _evict(self):
+        """Drop least recently used vectors until the cache is back to 80% of max_bytes."""
+        target = int(self.max_bytes * 0.8)
+        rows = self._db.execute("SELECT model, text_hash, dim FROM embeddings ORDER BY last_used ASC").fetchall()
+        total = sum(4 * dim for _, _, dim in rows)
+        evicted = []
+        for model, h, dim in rows:
+            if total <= target:
+                break
+            evicted.append((model, h))
+            total -= 4 * dim
+        self._db.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", evicted)
+        self._compact()
+
+    def _compact(self):
+        """Rewrite the vector files so only live rows remain, and renumber them."""
+        dims = [dim for (dim,) in self._db.execute("SELECT DISTINCT dim FROM embeddings")]
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".f32") and int(name[len("vectors_"):-len(".f32")]) not in dims:
+                os.remove(os.path.join(self.cache_dir, name))
+        for dim in dims:
+            live = self._db.execute(
+                "SELECT model, text_hash, row FROM embeddings WHERE dim = ? ORDER BY row", (dim,)
+            ).fetchall()
+            vectors = np.asarray(self._vectors(dim)[[row for _, _, row in live]], dtype=np.float32)
+            path = self._vector_file(dim)
+            tmp_path = path + ".tmp"
+            vectors.tofile(tmp_path)
+            # Release the old memory map before swapping the file underneath it
+            self._maps.pop(dim, None)
+            os.replace(tmp_path, path)
+            self._db.executemany(
+                "UPDATE embeddings SET row = ? WHERE model = ? AND text_hash = ?",
+                [(i, model, h) for i, (model, h, _) in enumerate(live)],
+            )
+        self._db.commit()
+
+    def stats(self):
+        """Hits, misses and storage used since this cache object was opened."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": self._total_bytes(),
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an Embeddings model so documents already embedded are read from the cache."""
+
+    def __init__(self, embeddings, cache=None):
+        self.embeddings = embeddings
+        self.cache = cache or EmbeddingCache()
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def embed_documents(self, texts):
+        cached = self.cache.get_many(self.model, texts)
+        missing = [idx for idx, vector in enumerate(cached) if vector is None]
+        if missing:
+            # Embed each unseen text once even if the input repeats it
+            unique = list(dict.fromkeys(texts[idx] for idx in missing))
+            vectors = self.embeddings.embed_documents(unique)
+            self.cache.put_many(self.model, unique, vectors)
+            fresh = dict(zip(unique, vectors))
+            for idx in missing:
+                cached[idx] = fresh[texts[idx]]
+        return cached
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+if __name__ == "__main__":
+    for key, value in EmbeddingCache().stats().items():
+        print(f"{key}: {value}")
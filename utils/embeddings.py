@@ -1,37 +1,13 @@
 # embeddings.py
 
-import os
-import pickle
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+from utils.ingest import ingest
 
-def create_embeddings(text_file):
-    # Import necessary modules from indic-nlp-library
-    from indicnlp.tokenize import sentence_tokenize
-    from indicnlp import common
-    from indicnlp import loader
-
-    # Set the path to the Indic NLP Resources folder
-    INDIC_RESOURCES_PATH = "C:/Users/sibia/Downloads/indic_nlp_resources-master/indic_nlp_resources-master"  
-    common.set_resources_path(INDIC_RESOURCES_PATH)
-    loader.load()
-
- 
-    with open(text_file, 'r', encoding='utf-8') as f:
-        text = f.read()
-
-    # Split text into sentences using the Indic NLP Library
-    language = 'ta'  # 'ta' is the ISO code for Tamil
-    documents = sentence_tokenize.sentence_split(text, lang=language)
-
-    # Initialize OpenAI Embeddings
-    embeddings = OpenAIEmbeddings()
-
-    # Create FAISS vector store
-    vectorstore = FAISS.from_texts(documents, embeddings)
-
-    # Save the vector store to disk
-    vectorstore.save_local('data/faiss_index')
+def create_embeddings(text_file, store_path='data/faiss_index', rebuild=False):
+    # Sentence splitting, chunking, batched embedding and index writing live in
+    # utils.ingest; set INDIC_RESOURCES_PATH to use a local Indic NLP resources folder
+    summary = ingest(store_path, [text_file], rebuild=rebuild)
+    print(f"{store_path}: {summary['added']} added, {summary['deleted']} deleted, {summary['unchanged']} unchanged")
+    return summary
 
 if __name__ == "__main__":
-    create_embeddings('data/unit10.txt')
\ No newline at end of file
+    create_embeddings('data/unit10.txt', rebuild=True)
@@ -0,0 +1,243 @@
+# utils/exercise_pool.py
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from utils.llm_metrics import record_cache_hit
+from utils.structured_output import generation_stats
+from utils.tamil_text import text_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_PATH = "data/exercise_pool/exercises.sqlite"
+POOL_CAPACITY = int(os.getenv("EXERCISE_POOL_CAPACITY", 20))
+POOL_LOW_WATER = int(os.getenv("EXERCISE_POOL_LOW_WATER", 8))
+# Hashes of served passages kept per type so a repeat is rejected
+SERVED_HISTORY = 500
+# A refill gives up after this many generations per missing exercise
+MAX_ATTEMPTS_PER_SLOT = 3
+# Attempts for a child who finds the pool empty
+ON_DEMAND_ATTEMPTS = 3
+# Payload field holding the text exercises are deduplicated on, for types whose
+# "passage" is rendered with parts that change between generations
+SOURCE_FIELD = "source_passage"
+
+# Generators the CLI can fill pools with, as "module:function"
+GENERATORS = {
+    "nirappugaa": "module_nirapuga:generate_nirappugaa_exercise",
+    "karutharithal": "module_karutharithal:generate_karutharithal_exercise",
+}
+
+
+class ExercisePool:
+    """
+    Pre-generated, validated exercises of one type, stored on disk.
+
+    pop() hands out the oldest stored exercise. When fewer than low_water
+    remain, a background thread generates more until the pool holds
+    capacity. Exercises whose generator raises ValueError (unparseable
+    output) never enter the pool. Passages are deduplicated by normalized
+    text hash against the pool and the last SERVED_HISTORY served ones;
+    the hash is of SOURCE_FIELD when the exercise has it, else "passage".
+    The SQLite file is shared by every process on the machine.
+    """
+
+    def __init__(self, kind, generate, capacity=POOL_CAPACITY, low_water=POOL_LOW_WATER, path=DEFAULT_POOL_PATH):
+        self.kind = kind
+        self.generate = generate
+        self.capacity = capacity
+        self.low_water = low_water
+        self.path = path
+        self.api_key = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS exercises (
+                   kind TEXT NOT NULL,
+                   passage_hash TEXT NOT NULL,
+                   payload TEXT NOT NULL,
+                   created REAL NOT NULL,
+                   served REAL,
+                   PRIMARY KEY (kind, passage_hash)
+               )"""
+        )
+        self._refilling = False
+        self.counts = {"pool_hits": 0, "on_demand": 0, "generated": 0, "parse_failures": 0, "duplicates": 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def available(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM exercises WHERE kind = ? AND served IS NULL", (self.kind,)
+            ).fetchone()[0]
+
+    def _take(self):
+        with self._lock:
+            # IMMEDIATE takes the write lock first, so two processes cannot take the same row
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT passage_hash, payload FROM exercises WHERE kind = ? AND served IS NULL ORDER BY created LIMIT 1",
+                    (self.kind,),
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE exercises SET served = ? WHERE kind = ? AND passage_hash = ?",
+                        (time.time(), self.kind, row[0]),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return None if row is None else json.loads(row[1])
+
+    def _add(self, exercise, served=None):
+        """Store a generated exercise; returns False for a duplicate passage."""
+        passage = exercise.get(SOURCE_FIELD) or exercise.get("passage")
+        if not passage:
+            raise ValueError(f"{self.kind} exercise has no passage")
+        with self._lock:
+            added = self._db.execute(
+                "INSERT OR IGNORE INTO exercises (kind, passage_hash, payload, created, served) VALUES (?, ?, ?, ?, ?)",
+                (self.kind, text_hash(passage), json.dumps(exercise, ensure_ascii=False), time.time(), served),
+            ).rowcount
+            self._db.execute(
+                """DELETE FROM exercises WHERE kind = ? AND served IS NOT NULL AND passage_hash NOT IN (
+                       SELECT passage_hash FROM exercises WHERE kind = ? AND served IS NOT NULL
+                       ORDER BY served DESC LIMIT ?)""",
+                (self.kind, self.kind, SERVED_HISTORY),
+            )
+        return bool(added)
+
+    def _generate_one(self, api_key, served=None):
+        """Generate and store one exercise; returns it, or None if it was invalid or a duplicate."""
+        try:
+            exercise = self.generate(api_key)
+            self._count("generated")
+            if self._add(exercise, served):
+                return exercise
+            self._count("duplicates")
+        except ValueError as e:
+            self._count("parse_failures")
+            logger.warning("Discarded a %s exercise: %s", self.kind, e)
+        return None
+
+    def fill(self, api_key=None, target=None):
+        """Generate exercises until target (default capacity) are available; returns how many were added."""
+        target = self.capacity if target is None else target
+        missing = target - self.available()
+        added = 0
+        for _ in range(max(0, missing) * MAX_ATTEMPTS_PER_SLOT):
+            if added >= missing:
+                break
+            added += self._generate_one(api_key or self.api_key) is not None
+        return added
+
+    def _refill(self):
+        try:
+            added = self.fill()
+            logger.info("Refilled the %s pool with %d exercises", self.kind, added)
+        except Exception:
+            logger.exception("Refilling the %s pool failed", self.kind)
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def refill_async(self):
+        """Start a background refill unless one is already running in this process."""
+        with self._lock:
+            if self._refilling:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, name=f"{self.kind}-pool", daemon=True).start()
+
+    def warm(self, api_key=None):
+        """Refill in the background if the pool is below its low-water mark."""
+        if api_key:
+            self.api_key = api_key
+        if self.available() < self.low_water:
+            self.refill_async()
+
+    def pop(self, api_key=None):
+        """
+        Return a ready exercise, generating one on the spot if the pool is empty.
+
+        Raises:
+            ValueError: The pool was empty and no valid exercise could be generated.
+        """
+        if api_key:
+            self.api_key = api_key
+        exercise = self._take()
+        if exercise is not None:
+            self._count("pool_hits")
+            record_cache_hit(self.kind, "exercise_pool")
+        else:
+            self._count("on_demand")
+            for _ in range(ON_DEMAND_ATTEMPTS):
+                # Stored as served, so it counts towards dedupe but is not handed out again
+                exercise = self._generate_one(api_key or self.api_key, served=time.time())
+                if exercise is not None:
+                    break
+        self.warm()
+        if exercise is None:
+            raise ValueError(f"Could not generate a valid {self.kind} exercise.")
+        return exercise
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        served = counts["pool_hits"] + counts["on_demand"]
+        return {
+            **counts,
+            "available": self.available(),
+            "hit_rate": counts["pool_hits"] / served if served else 0.0,
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_exercise_pool(kind, generate=None):
+    """Return the process-wide pool for an exercise type, creating it on first use."""
+    pool = _pools.get(kind)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(kind)
+            if pool is None:
+                if generate is None:
+                    module, function = GENERATORS[kind].split(":")
+                    generate = getattr(importlib.import_module(module), function)
+                pool = ExercisePool(kind, generate)
+                _pools[kind] = pool
+    return pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill or inspect the pre-generated exercise pools.")
+    parser.add_argument("kinds", nargs="*", default=sorted(GENERATORS), help="Exercise types; defaults to all")
+    parser.add_argument("--fill", action="store_true", help="Generate exercises until each pool is full")
+    parser.add_argument("--capacity", type=int, default=POOL_CAPACITY)
+    args = parser.parse_args()
+
+    for kind in args.kinds:
+        pool = get_exercise_pool(kind)
+        if args.fill:
+            print(f"{kind}: added {pool.fill(os.getenv('OPENAI_API_KEY'), target=args.capacity)}")
+        print(json.dumps({"kind": kind, **pool.stats()}, ensure_ascii=False))
+        if kind in generation_stats():
+            print(json.dumps({"kind": kind, **generation_stats()[kind]}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
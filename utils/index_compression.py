@@ -0,0 +1,163 @@
+# utils/index_compression.py
+
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+
+import faiss
+import numpy as np
+
+from utils.docstore import BLOB_NAME, OFFSETS_NAME
+from utils.vectorstore_registry import publish_version, resolve_store
+
+INDEX_KINDS = ("flat", "ivf_flat", "pq", "opq", "fp16", "pca_fp16")
+
+
+def index_factory_string(kind, dim, count):
+    """
+    FAISS factory string for an index kind, with parameters scaled to the store.
+
+    Small stores cannot train 256 centroids or a 1536-d PCA, so the number of
+    IVF lists, PQ bits and PCA dimensions shrink with the number of vectors.
+    """
+    # 96 sub-quantizers of 16 dims each for ada-002; must divide the dimension
+    pq_m = next(m for m in (96, 64, 48, 32, 16, 8, 4, 2, 1) if dim % m == 0)
+    pq_bits = max(1, min(8, int(math.log2(max(count, 2))) - 1))
+    if kind == "flat":
+        return "Flat"
+    if kind == "ivf_flat":
+        return f"IVF{max(1, int(math.sqrt(count)))},Flat"
+    if kind == "pq":
+        return f"PQ{pq_m}x{pq_bits}"
+    if kind == "opq":
+        return f"OPQ{pq_m},PQ{pq_m}x{pq_bits}"
+    if kind == "fp16":
+        return "SQfp16"
+    if kind == "pca_fp16":
+        return f"PCA{min(256, dim, count)},SQfp16"
+    raise ValueError(f"Unknown index kind '{kind}'; choose from {', '.join(INDEX_KINDS)}.")
+
+
+def read_vectors(store_path):
+    """Read the full-precision vectors from a store's flat index."""
+    index = faiss.read_index(os.path.join(resolve_store(store_path), "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def build_index(vectors, kind, nprobe=8):
+    """Train and fill an index of the given kind; vector positions are preserved."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    index = faiss.index_factory(dim, index_factory_string(kind, dim, count))
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    if kind == "ivf_flat":
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    return index
+
+
+def build_store(store_path, out_path, kind, nprobe=8):
+    """
+    Write a servable copy of a store with its index re-encoded as `kind`.
+
+    The docstore files are copied unchanged. The output has no manifest:
+    compressed vectors cannot be decoded exactly, so keep the flat store as
+    the one utils.ingest maintains and rebuild the compressed copy from it.
+    The copy is published as a new version of out_path.
+    """
+    index = build_index(read_vectors(store_path), kind, nprobe=nprobe)
+    source_dir = resolve_store(store_path)
+
+    def write_files(directory):
+        for name in ("index.pkl", OFFSETS_NAME, BLOB_NAME):
+            if os.path.exists(os.path.join(source_dir, name)):
+                shutil.copyfile(os.path.join(source_dir, name), os.path.join(directory, name))
+        faiss.write_index(index, os.path.join(directory, "index.faiss"))
+
+    publish_version(out_path, write_files)
+    return index
+
+
+def benchmark_store(store_path, kinds=INDEX_KINDS, k=4, num_queries=200, noise=0.02, seed=0):
+    """
+    Compare index kinds against the flat index of a store.
+
+    Queries are stored vectors with Gaussian noise added, so the benchmark
+    runs offline. Recall@k is the overlap of each kind's top k with the flat
+    index's top k.
+    """
+    vectors = read_vectors(store_path)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(vectors), size=num_queries)
+    queries = vectors[picks] + rng.normal(0, noise, size=(num_queries, vectors.shape[1])).astype(np.float32)
+    k = min(k, len(vectors))
+
+    flat = build_index(vectors, "flat")
+    _, truth = flat.search(queries, k)
+
+    results = []
+    for kind in kinds:
+        try:
+            index = build_index(vectors, kind)
+        except RuntimeError as e:
+            results.append({"store": store_path, "kind": kind, "error": str(e)})
+            continue
+        latencies = []
+        found = np.empty_like(truth)
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], k)
+            latencies.append(time.perf_counter() - start)
+            found[i] = ids[0]
+        recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(num_queries)])
+        results.append({
+            "store": store_path,
+            "kind": kind,
+            "factory": index_factory_string(kind, vectors.shape[1], len(vectors)),
+            f"recall@{k}": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 4),
+            "bytes": int(faiss.serialize_index(index).size),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build compressed FAISS indexes and benchmark them.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Write a copy of a store with a compressed index")
+    build.add_argument("store")
+    build.add_argument("out")
+    build.add_argument("--kind", choices=INDEX_KINDS, required=True)
+    build.add_argument("--nprobe", type=int, default=8, help="IVF lists searched per query")
+
+    bench = sub.add_parser("bench", help="Report recall@k, latency and size per index kind")
+    bench.add_argument("stores", nargs="+")
+    bench.add_argument("--kinds", nargs="+", choices=INDEX_KINDS, default=list(INDEX_KINDS))
+    bench.add_argument("-k", type=int, default=4)
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--json", help="Also write the results to this file")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        index = build_store(args.store, args.out, args.kind, nprobe=args.nprobe)
+        print(f"{args.out}: {index.ntotal} vectors, {faiss.serialize_index(index).size} bytes")
+        return
+
+    results = []
+    for store_path in args.stores:
+        results.extend(benchmark_store(store_path, args.kinds, k=args.k, num_queries=args.queries))
+    for row in results:
+        print(json.dumps(row, ensure_ascii=False))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
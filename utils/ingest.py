@@ -0,0 +1,287 @@
+# utils/ingest.py
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+
+from langchain_community.embeddings import OpenAIEmbeddings
+from langchain_community.vectorstores import FAISS
+
+from utils.chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, chunk_sentences, split_sentences, unit_from_path
+from utils.data_extraction import iter_pdf_pages
+from utils.docstore import BLOB_NAME, OFFSETS_NAME, write_docstore
+from utils.embedding_cache import CachedEmbeddings
+from utils.tamil_text import text_hash
+from utils.vectorstore_registry import publish_version, resolve_store
+
+MANIFEST_NAME = "manifest.json"
+STORE_FILES = ("index.faiss", "index.pkl", OFFSETS_NAME, BLOB_NAME)
+DEFAULT_BATCH_SIZE = 256
+_DONE = object()
+
+
+def _source_metadata(path, page=None):
+    metadata = {"source": path}
+    unit = unit_from_path(path)
+    if unit is not None:
+        metadata["unit"] = unit
+    if page is not None:
+        metadata["page"] = page
+    return metadata
+
+
+def chunk_text_file(path, chunk_size, chunk_overlap):
+    """Worker: chunk one text file into (chunk, metadata) pairs."""
+    with open(path, encoding="utf-8") as f:
+        chunks = chunk_sentences(split_sentences(f.read()), chunk_size, chunk_overlap)
+    return [(chunk, _source_metadata(path)) for chunk in chunks]
+
+
+def iter_pdf_chunks(path, pages, chunk_size, chunk_overlap):
+    """Chunk one PDF's (path, page_number, text) pages as they are extracted."""
+    for _, page_number, text in pages:
+        for chunk in chunk_sentences(split_sentences(text), chunk_size, chunk_overlap):
+            yield chunk, _source_metadata(path, page_number + 1)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(store_path):
+    path = os.path.join(resolve_store(store_path), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_store(vectorstore, manifest, store_path):
+    """
+    Publish the store as a new version through its CURRENT pointer.
+
+    Every file of the version, the manifest last, is written into a fresh
+    directory before the pointer is swapped, so readers see either the old
+    store or the new one, never a mix. Files of an unversioned store are
+    removed once the first version is live.
+    """
+    def write_files(directory):
+        vectorstore.save_local(directory)
+        # The app loads the memory-mapped docstore; index.pkl is kept so the
+        # next incremental run can load and modify the store
+        write_docstore(vectorstore, directory)
+        with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    publish_version(store_path, write_files)
+    for name in STORE_FILES + (MANIFEST_NAME,):
+        legacy = os.path.join(store_path, name)
+        if os.path.exists(legacy):
+            os.remove(legacy)
+
+
+def _split_text_files(paths, chunk_size, chunk_overlap, max_workers):
+    """Yield (path, chunks) per text file in order, with at most two files per worker in flight."""
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append((path, pool.submit(chunk_text_file, path, chunk_size, chunk_overlap)))
+            if len(pending) >= 2 * workers:
+                done_path, future = pending.popleft()
+                yield done_path, future.result()
+        while pending:
+            done_path, future = pending.popleft()
+            yield done_path, future.result()
+
+
+def _split_sources(paths, chunk_size, chunk_overlap, max_workers):
+    """Yield (path, iterable of (chunk, metadata)) for each source as it is split."""
+    text_files = [path for path in paths if not path.lower().endswith(".pdf")]
+    if text_files:
+        yield from _split_text_files(text_files, chunk_size, chunk_overlap, max_workers)
+    # Every PDF shares one extraction pool; pages arrive in document order,
+    # so each PDF's pages are consecutive and chunked as they stream in
+    pdf_files = [path for path in paths if path.lower().endswith(".pdf")]
+    if pdf_files:
+        for path, pages in groupby(iter_pdf_pages(pdf_files, max_workers), key=itemgetter(0)):
+            yield path, iter_pdf_chunks(path, pages, chunk_size, chunk_overlap)
+
+
+def _timed_iter(timings, stage, iterable):
+    """Yield from iterable, charging the time spent producing each item to stage."""
+    iterator = iter(iterable)
+    while True:
+        with _timed(timings, stage):
+            item = next(iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
+
+
+@contextmanager
+def _timed(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def ingest(store_path, source_paths, rebuild=False, prune=False, embeddings=None,
+           chunk_size=DEFAULT_CHUNK_SIZE, chunk_overlap=DEFAULT_CHUNK_OVERLAP,
+           batch_size=DEFAULT_BATCH_SIZE, max_workers=None):
+    """
+    Bring a vector store in line with its source files, embedding only new chunks.
+
+    Args:
+        store_path (str): Vector store directory, e.g. "data/vectorstore_med".
+        source_paths (list[str]): Text or PDF files to index.
+        rebuild (bool): Ignore the existing store and manifest and build from scratch.
+        prune (bool): Drop sources recorded in the manifest but not listed in source_paths.
+        embeddings: Embeddings model. Defaults to cached OpenAIEmbeddings.
+        chunk_size (int): Maximum chunk length in Tamil graphemes.
+        chunk_overlap (int): Graphemes carried over from the previous chunk.
+        batch_size (int): Chunks embedded and added to the index per batch.
+        max_workers (int | None): Processes used to split text files.
+
+    Returns:
+        dict: Counts of added, deleted and unchanged chunks, and seconds per stage.
+    """
+    timings = {}
+    embeddings = embeddings or CachedEmbeddings(OpenAIEmbeddings())
+    model = getattr(embeddings, "model", type(embeddings).__name__)
+    chunking = {"size": chunk_size, "overlap": chunk_overlap}
+    live_dir = resolve_store(store_path)
+    store_exists = os.path.exists(os.path.join(live_dir, "index.faiss"))
+
+    manifest = None if rebuild else load_manifest(store_path)
+    if store_exists and manifest is None and not rebuild:
+        raise RuntimeError(
+            f"{store_path} has no {MANIFEST_NAME}; run once with --rebuild to index it from its sources."
+        )
+    if manifest is not None and manifest["embedding_model"] != model:
+        raise RuntimeError(
+            f"{store_path} was built with {manifest['embedding_model']}, not {model}; use --rebuild."
+        )
+    manifest = manifest or {"embedding_model": model, "chunking": chunking, "sources": {}, "vector_ids": []}
+    # Different chunking settings produce different chunks from unchanged files
+    rechunk = manifest.get("chunking") != chunking
+
+    with _timed(timings, "hash"):
+        # Keep sources from earlier runs unless they were deleted or pruned
+        sources = {
+            path: entry for path, entry in manifest["sources"].items()
+            if os.path.exists(path) and not (prune and path not in source_paths)
+        }
+        if rechunk:
+            source_paths = list(dict.fromkeys([*source_paths, *sources]))
+        digests = {path: file_hash(path) for path in source_paths}
+        changed = [
+            path for path in source_paths
+            if rechunk or path not in sources or sources[path]["sha256"] != digests[path]
+        ]
+
+    stored_ids = set(manifest["vector_ids"])
+    vectorstore = None
+    with _timed(timings, "load"):
+        if store_exists and not rebuild:
+            vectorstore = FAISS.load_local(live_dir, embeddings, allow_dangerous_deserialization=True)
+
+    added = []
+    batch = []
+
+    def flush():
+        nonlocal vectorstore
+        batch_ids = [chunk_id for chunk_id, _, _ in batch]
+        texts = [chunk for _, chunk, _ in batch]
+        metadatas = [metadata for _, _, metadata in batch]
+        with _timed(timings, "embed"):
+            vectors = embeddings.embed_documents(texts)
+        with _timed(timings, "index"):
+            pairs = list(zip(texts, vectors))
+            if vectorstore is None:
+                vectorstore = FAISS.from_embeddings(pairs, embeddings, metadatas=metadatas, ids=batch_ids)
+            else:
+                vectorstore.add_embeddings(pairs, metadatas=metadatas, ids=batch_ids)
+        added.extend(batch_ids)
+        batch.clear()
+
+    # Chunks go from the splitter straight into embedding batches, so only
+    # chunk ids and one batch of text are held regardless of corpus size
+    queued = set()
+    for path, pairs in _timed_iter(timings, "split", _split_sources(changed, chunk_size, chunk_overlap, max_workers)):
+        ids = []
+        for chunk, metadata in _timed_iter(timings, "split", pairs):
+            chunk_id = text_hash(chunk)
+            ids.append(chunk_id)
+            if chunk_id not in stored_ids and chunk_id not in queued:
+                queued.add(chunk_id)
+                batch.append((chunk_id, chunk, metadata))
+                if len(batch) >= batch_size:
+                    flush()
+        sources[path] = {"sha256": digests[path], "chunks": list(dict.fromkeys(ids))}
+    if batch:
+        flush()
+
+    live_ids = {chunk_id for entry in sources.values() for chunk_id in entry["chunks"]}
+    if not live_ids:
+        raise RuntimeError("No chunks left to index.")
+    to_delete = sorted(stored_ids - live_ids)
+    if to_delete:
+        with _timed(timings, "index"):
+            vectorstore.delete(to_delete)
+
+    summary = {
+        "added": len(added),
+        "deleted": len(to_delete),
+        "unchanged": len(live_ids & stored_ids),
+    }
+    if added or to_delete or sources != manifest["sources"] or rechunk:
+        manifest = {
+            "embedding_model": model,
+            "chunking": chunking,
+            "sources": sources,
+            "vector_ids": sorted(live_ids),
+        }
+        with _timed(timings, "write"):
+            write_store(vectorstore, manifest, store_path)
+    summary["timings"] = timings
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update a FAISS vector store from text and PDF files.")
+    parser.add_argument("store", help="Vector store directory, e.g. data/vectorstore_med")
+    parser.add_argument("sources", nargs="+", help="Text or PDF files to index")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the store from scratch")
+    parser.add_argument("--prune", action="store_true", help="Remove sources not listed on this run")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Chunk size in Tamil graphemes")
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP, help="Overlap in Tamil graphemes")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Chunks embedded per batch")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used to split text files")
+    args = parser.parse_args()
+
+    summary = ingest(
+        args.store, args.sources, rebuild=args.rebuild, prune=args.prune,
+        chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size, max_workers=args.workers,
+    )
+    print(f"{args.store}: {summary['added']} added, {summary['deleted']} deleted, {summary['unchanged']} unchanged")
+    for stage, seconds in summary["timings"].items():
+        print(f"  {stage:<6} {seconds:8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# utils/lexical_index.py
+
+import logging
+import math
+import re
+import threading
+import weakref
+from collections import Counter, defaultdict
+from typing import Any, List
+
+import faiss
+import numpy as np
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.schema import BaseRetriever, Document
+
+from utils.tamil_text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Tamil block plus ASCII letters and digits. Tamil vowel signs are combining
+# marks, which \w does not match, so spell the range out.
+_TOKEN = re.compile(r"[0-9a-z\u0b80-\u0bff]+")
+
+# Common case, plural and clitic endings as written after a consonant, longest
+# first so "களுக்கு" is stripped before "க்கு". Applied to both documents and
+# queries, so மரத்தில், மரத்தை and மரம் all reduce to மர.
+_SUFFIXES = sorted([
+    "களுக்கு", "களிடம்", "களால்", "களின்", "களில்", "களோடு", "களை", "கள்",
+    "த்திலிருந்து", "த்துக்கு", "த்திற்கு", "த்தில்", "த்தால்", "த்தின்", "த்தை", "த்து",
+    "ிலிருந்து", "ுக்கு", "க்கு", "ிற்கு", "ிடம்", "ுடன்", "ோடு", "ால்", "ின்", "ில்",
+    "ும்", "ாக", "ான", "ை", "ம்",
+], key=len, reverse=True)
+_MIN_STEM = 2
+
+
+def tokenize(text):
+    """Split normalized text into word tokens."""
+    return _TOKEN.findall(normalize_text(text))
+
+
+def stem(token):
+    """Strip one inflectional suffix, keeping at least _MIN_STEM characters."""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+class BM25Index:
+    """In-memory inverted index over stemmed Tamil/English tokens, scored with BM25."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.surface_tokens = []
+        self.lengths = []
+        for idx, doc in enumerate(self.documents):
+            tokens = tokenize(doc.page_content)
+            self.surface_tokens.append(set(tokens))
+            self.lengths.append(len(tokens))
+            for term, tf in Counter(stem(token) for token in tokens).items():
+                self.postings[term].append((idx, tf))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, **kwargs):
+        """Index the same chunks as a FAISS store, in index order."""
+        documents = []
+        for position in range(vectorstore.index.ntotal):
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+            documents.append(doc)
+        return cls(documents, **kwargs)
+
+    def _ranked(self, query):
+        """(document index, score) for every document matching a query term, best first."""
+        n = len(self.documents)
+        scores = defaultdict(float)
+        for term in {stem(token) for token in tokenize(query)}:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[idx] / self.avg_length)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def search_positions(self, query, k=4):
+        """Return up to k (position, score) pairs, best first; positions are index order in the store."""
+        return self._ranked(query)[:k]
+
+    def search(self, query, k=4):
+        """Return up to k (document, score) pairs, best first."""
+        return [(self.documents[idx], score) for idx, score in self.search_positions(query, k)]
+
+    def exact_matches(self, query, k=4):
+        """Documents containing every query word exactly as typed, best BM25 first."""
+        words = set(tokenize(query))
+        if not words:
+            return []
+        matches = [idx for idx, _ in self._ranked(query) if words <= self.surface_tokens[idx]]
+        return [self.documents[idx] for idx in matches[:k]]
+
+
+# Weakly keyed, so a store replaced by a reload is freed together with its BM25 index
+_indexes = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_lexical_index(vectorstore):
+    """Build the BM25 index for a vector store once and reuse it until the store is reloaded."""
+    with _lock:
+        index = _indexes.get(vectorstore)
+    if index is None:
+        index = BM25Index.from_vectorstore(vectorstore)
+        with _lock:
+            _indexes[vectorstore] = index
+    return index
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuse BM25 and vector search results with reciprocal rank fusion.
+
+    Short queries whose words all appear verbatim in some chunk are answered
+    from the lexical index alone, skipping the query embedding call.
+    """
+
+    vectorstore: Any
+    lexical_index: Any
+    search_kwargs: dict = {"k": 4}
+    exact_match_max_words: int = 3
+    rrf_k: int = 60
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _vector_distances(self, embedding, positions):
+        """Distances from the query to the stored vectors at these positions, in the index's own metric."""
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.asarray(positions, dtype=np.int64)))
+        try:
+            distances, found = self.vectorstore.index.search(embedding, len(positions), params=params)
+        except RuntimeError as e:
+            logger.warning("Index cannot score selected vectors (%s); lexical-only hits score 0", e)
+            return {}
+        return {int(position): float(distance) for position, distance in zip(found[0], distances[0]) if position != -1}
+
+    def scored_documents(self, query, k=None):
+        """
+        Return up to k (document, relevance) pairs with relevance in [0, 1].
+
+        Exact lexical hits score 1.0. Otherwise documents are ordered by
+        reciprocal rank fusion of the BM25 and vector result lists, and every
+        one is scored by its vector relevance to the query, including those
+        only BM25 found, so one cutoff applies to both.
+        """
+        k = k or self.search_kwargs.get("k", 4)
+        if len(tokenize(query)) <= self.exact_match_max_words:
+            exact = self.lexical_index.exact_matches(query, k=k)
+            if exact:
+                return [(doc, 1.0) for doc in exact]
+
+        lexical = self.lexical_index.search_positions(query, k=k)
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        vector_kwargs = {**self.search_kwargs, "k": k}
+        vector = self.vectorstore.similarity_search_with_score_by_vector(embedding, **vector_kwargs)
+        # The same distance-to-relevance mapping similarity_search_with_relevance_scores uses
+        relevance_fn = self.vectorstore._select_relevance_score_fn()
+
+        fused = defaultdict(float)
+        relevance = {}
+        by_content = {}
+        for rank, (doc, distance) in enumerate(vector):
+            fused[doc.page_content] += 1 / (self.rrf_k + rank + 1)
+            by_content[doc.page_content] = doc
+            relevance[doc.page_content] = relevance_fn(distance)
+        lexical_only = []
+        for rank, (position, _) in enumerate(lexical):
+            doc = self.lexical_index.documents[position]
+            fused[doc.page_content] += 1 / (self.rrf_k + rank + 1)
+            if doc.page_content not in by_content:
+                by_content[doc.page_content] = doc
+                lexical_only.append(position)
+        if lexical_only:
+            query_vector = np.asarray([embedding], dtype=np.float32)
+            distances = self._vector_distances(query_vector, lexical_only)
+            for position in lexical_only:
+                content = self.lexical_index.documents[position].page_content
+                relevance[content] = relevance_fn(distances[position]) if position in distances else 0.0
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        return [(by_content[content], relevance[content]) for content in best]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [doc for doc, _ in self.scored_documents(query)]
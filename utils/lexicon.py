@@ -0,0 +1,192 @@
+# utils/lexicon.py
+
+import argparse
+import json
+import mmap
+import os
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+
+from utils.lexical_index import tokenize
+from utils.tamil_text import normalize_text
+
+LEXICON_DIR = "data/lexicon"
+SOURCE_NAME = "lexicon.jsonl"
+OFFSETS_NAME = "lexicon.offsets.npy"
+BLOB_NAME = "lexicon.blob"
+FIELDS = ("meaning", "translation")
+
+_PUNCTUATION = " \t\n.,!?;:'\"()[]{}“”‘’"
+
+
+def lexicon_key(text):
+    return normalize_text(text).strip(_PUNCTUATION)
+
+
+def compile_lexicon(entries, out_dir=LEXICON_DIR):
+    """
+    Write entries as a sorted key table for binary search.
+
+    Row i of the offsets table holds the start of key i and of its JSON
+    value in the blob; the next row's key start ends the value.
+    """
+    rows = {}
+    for entry in entries:
+        value = {field: entry[field] for field in FIELDS if entry.get(field)}
+        if value:
+            rows.setdefault(lexicon_key(entry["word"]), {}).update(value)
+    offsets = []
+    position = 0
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, BLOB_NAME + ".tmp"), "wb") as blob:
+        for key in sorted(rows):
+            key_bytes = key.encode("utf-8")
+            value_bytes = json.dumps(rows[key], ensure_ascii=False).encode("utf-8")
+            offsets.append((position, position + len(key_bytes)))
+            blob.write(key_bytes + value_bytes)
+            position += len(key_bytes) + len(value_bytes)
+    offsets.append((position, position))
+    with open(os.path.join(out_dir, OFFSETS_NAME + ".tmp"), "wb") as f:
+        np.save(f, np.asarray(offsets, dtype=np.int64).reshape(-1, 2))
+    for name in (BLOB_NAME, OFFSETS_NAME):
+        os.replace(os.path.join(out_dir, name + ".tmp"), os.path.join(out_dir, name))
+    return len(rows)
+
+
+class Lexicon:
+    """Read-only view of a compiled lexicon, memory-mapped on first use."""
+
+    def __init__(self, lexicon_dir=LEXICON_DIR):
+        self.lexicon_dir = lexicon_dir
+        self._offsets = None
+        self._blob = None
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        with self._load_lock:
+            if self._offsets is not None:
+                return
+            offsets_path = os.path.join(self.lexicon_dir, OFFSETS_NAME)
+            blob_path = os.path.join(self.lexicon_dir, BLOB_NAME)
+            if not os.path.exists(offsets_path) or not os.path.exists(blob_path) or not os.path.getsize(blob_path):
+                # No lexicon compiled yet: every lookup misses
+                self._offsets = np.zeros((1, 2), dtype=np.int64)
+                self._blob = b""
+                return
+            with open(blob_path, "rb") as f:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._offsets = np.load(offsets_path, mmap_mode="r", allow_pickle=False)
+
+    def __len__(self):
+        if self._offsets is None:
+            self._load()
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        # Keys are exposed as a sorted sequence so bisect can search the mmap directly
+        start, end = int(self._offsets[row][0]), int(self._offsets[row][1])
+        return self._blob[start:end].decode("utf-8")
+
+    def lookup(self, text, field):
+        """Return the stored answer for text, or None. Counts a hit or a miss."""
+        key = lexicon_key(text)
+        row = bisect_left(self, key, 0, len(self))
+        if row < len(self) and self[row] == key:
+            value_start, value_end = int(self._offsets[row][1]), int(self._offsets[row + 1][0])
+            answer = json.loads(self._blob[value_start:value_end].decode("utf-8")).get(field)
+            if answer:
+                with self._stats_lock:
+                    self.hits += 1
+                return answer
+        with self._stats_lock:
+            self.misses += 1
+        return None
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+
+_lexicon = Lexicon()
+
+
+def lookup(text, field):
+    """Answer `field` ("meaning" or "translation") for text from the shared lexicon."""
+    return _lexicon.lookup(text, field)
+
+
+def lexicon_stats():
+    return _lexicon.stats()
+
+
+def mine_candidates(source_paths, top):
+    """Most frequent words across the source texts, with their counts."""
+    counts = Counter()
+    for path in source_paths:
+        with open(path, encoding="utf-8") as f:
+            counts.update(token for token in tokenize(f.read()) if not token.isdigit())
+    return counts.most_common(top)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local meaning/translation lexicon.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    mine = sub.add_parser("mine", help="Draft answers for the most frequent textbook words")
+    mine.add_argument("sources", nargs="+", help="Text files, e.g. data/unit10.txt data/data_cleaned.txt")
+    mine.add_argument("--top", type=int, default=300)
+    mine.add_argument("--out", default=os.path.join(LEXICON_DIR, SOURCE_NAME))
+
+    build = sub.add_parser("compile", help="Compile reviewed entries into the lookup files")
+    build.add_argument("--source", default=os.path.join(LEXICON_DIR, SOURCE_NAME))
+    build.add_argument("--include-unreviewed", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "mine":
+        # Draft with the same chains the buttons use, so a hit returns what the LLM would have said
+        from module_meaning import setup_rag_pipeline_meaning
+        from module_translation import setup_translation_chain
+
+        existing = set()
+        if os.path.exists(args.out):
+            with open(args.out, encoding="utf-8") as f:
+                existing = {lexicon_key(json.loads(line)["word"]) for line in f if line.strip()}
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+        with open(args.out, "a", encoding="utf-8") as out:
+            for word, count in mine_candidates(args.sources, args.top):
+                if lexicon_key(word) in existing:
+                    continue
+                entry = {
+                    "word": word,
+                    "count": count,
+                    "meaning": setup_rag_pipeline_meaning()({"query": word})["result"],
+                    "translation": setup_translation_chain().run(question=word),
+                    "reviewed": False,
+                }
+                out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                out.flush()
+                print(f"{word}: drafted")
+        print(f"Review {args.out} and set \"reviewed\": true on entries to keep, then run compile.")
+        return
+
+    with open(args.source, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries = [entry for entry in entries if entry.get("reviewed") or args.include_unreviewed]
+    print(f"Compiled {compile_lexicon(entries)} words into {LEXICON_DIR}")
+
+
+if __name__ == "__main__":
+    main()
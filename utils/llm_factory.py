@@ -0,0 +1,104 @@
+# utils/llm_factory.py
+
+import os
+import threading
+
+import httpx
+
+# Keep-alive pool shared by every OpenAI call in the process
+POOL_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60)
+REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+_lock = threading.Lock()
+_http_client = None
+_async_http_client = None
+_llms = {}
+_chains = {}
+
+
+def get_http_client():
+    """Return the shared pooled HTTP client used by the OpenAI SDK."""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT)
+    return _http_client
+
+
+def get_async_http_client():
+    """Return the shared pooled async HTTP client used by the OpenAI SDK."""
+    global _async_http_client
+    if _async_http_client is None:
+        with _lock:
+            if _async_http_client is None:
+                _async_http_client = httpx.AsyncClient(limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT)
+    return _async_http_client
+
+
+def get_chat_llm(model_name="gpt-4o", temperature=0.3, max_tokens=None, api_key=None, streaming=False,
+                 module="default"):
+    """
+    Return a shared chat model for the given settings.
+
+    The model is a drop-in for ChatOpenAI whose requests go through the
+    async gateway in models/llm_integration.py, which adds timeouts, retries
+    and a per-model concurrency limit. Instances are immutable once built,
+    so they are safe to share between Streamlit sessions and threads. With
+    streaming=True, callbacks passed to a call receive each token as it
+    arrives (see utils.streaming). Calls are recorded in utils.llm_metrics
+    under module.
+    """
+    # The gateway imports this module for its HTTP client
+    from models.llm_integration import GatewayChatModel
+
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    key = (model_name, temperature, max_tokens, api_key, streaming, module)
+    llm = _llms.get(key)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(key)
+            if llm is None:
+                llm = GatewayChatModel(
+                    model_name=model_name,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    openai_api_key=api_key,
+                    streaming=streaming,
+                    module=module,
+                )
+                _llms[key] = llm
+    return llm
+
+
+def get_chain(module, build_chain, model_name="gpt-4o", temperature=0.3, max_tokens=None, version=None,
+              streaming=False):
+    """
+    Build a chain once per (module, model, temperature, max_tokens) and reuse it.
+
+    Args:
+        module (str): Name of the calling module, e.g. "meaning"; also the
+            label its LLM calls are recorded under.
+        build_chain (callable): Called with the shared LLM to construct the chain.
+        model_name (str): OpenAI chat model.
+        temperature (float): Sampling temperature.
+        max_tokens (int | None): Completion token limit.
+        version: Anything the chain depends on besides the LLM settings, such as
+            the vector store behind a retriever. The chain is rebuilt when it
+            is no longer the same object.
+        streaming (bool): Build the chain on a streaming LLM.
+
+    Returns:
+        The cached chain. Chains must not hold per-session state; pass things
+        like conversation history in as inputs on each call.
+    """
+    key = (module, model_name, temperature, max_tokens, streaming)
+    entry = _chains.get(key)
+    if entry is not None and entry[0] is version:
+        return entry[1]
+    # Building a chain makes no network calls, so a duplicate build from a
+    # concurrent session is harmless; the last one wins.
+    chain = build_chain(get_chat_llm(model_name, temperature, max_tokens, streaming=streaming, module=module))
+    with _lock:
+        _chains[key] = (version, chain)
+    return chain
@@ -0,0 +1,345 @@
+# utils/llm_metrics.py
+
+import argparse
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One JSON line per LLM call; set LLM_METRICS_PATH to "" to turn the sink off
+METRICS_PATH = os.getenv("LLM_METRICS_PATH", "data/metrics/llm_calls.jsonl")
+
+# USD per million tokens: (prompt, cached prompt, completion)
+PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4": (30.00, 30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+}
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+# Counters the features record with record_count(), exported as <name>_total
+COUNTERS = {
+    "moderation_checks": "Moderation checks answered, by tier.",
+    "moderation_speculative_answers": "Answers generated while the LLM moderated, by outcome.",
+    "moderation_discarded_tokens": "Tokens spent on speculative answers to flagged input.",
+    "grading_questions": "Answers graded, by mode.",
+    "grading_latency_saved_seconds": "Grading latency saved against one call per question in sequence, by mode.",
+    "grading_tokens_saved": "Prompt tokens saved by grading every answer in one call.",
+    "exercise_generation": "Exercise generation by kind and event: exercises, LLM calls, parse and schema "
+                           "failures, repair retries and exercises that failed.",
+}
+
+
+def call_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Estimated USD cost of one call; 0 for a model without a price."""
+    prompt, cached, completion = PRICES.get(model, (0.0, 0.0, 0.0))
+    return ((prompt_tokens - cached_tokens) * prompt + cached_tokens * cached + completion_tokens * completion) / 1e6
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the shape Prometheus expects."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class LLMMetrics:
+    """
+    Counters and histograms per (module, model), plus a JSONL sink.
+
+    The gateway records every completion here; modules record answers
+    served from a cache with record_cache_hit(), time to the first token
+    shown with record_answer_ttft() and feature counters with
+    record_count(). prometheus_text() renders the aggregates for a scrape
+    endpoint or textfile collector.
+    """
+
+    def __init__(self, path=METRICS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _histogram(self, name, key, buckets):
+        histogram = self._histograms.get((name, key))
+        if histogram is None:
+            histogram = self._histograms[(name, key)] = Histogram(buckets)
+        return histogram
+
+    def _write(self, row):
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning("Could not write LLM metrics: %s", e)
+
+    def record_call(self, module, model, prompt_tokens=0, completion_tokens=0, cached_tokens=0,
+                    queue_seconds=0.0, ttft_seconds=None, latency_seconds=0.0, retries=0, error=None):
+        """Record one completion, successful or not."""
+        cost = call_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        key = (module, model)
+        with self._lock:
+            self._counters[("calls", key, "error" if error else "ok")] += 1
+            self._counters[("prompt_tokens", key)] += prompt_tokens
+            self._counters[("completion_tokens", key)] += completion_tokens
+            self._counters[("cached_tokens", key)] += cached_tokens
+            self._counters[("retries", key)] += retries
+            self._counters[("cost", key)] += cost
+            self._histogram("latency", key, SECONDS_BUCKETS).observe(latency_seconds)
+            self._histogram("queue", key, SECONDS_BUCKETS).observe(queue_seconds)
+            if ttft_seconds is not None:
+                self._histogram("ttft", key, SECONDS_BUCKETS).observe(ttft_seconds)
+            self._histogram("tokens", key, TOKEN_BUCKETS).observe(prompt_tokens + completion_tokens)
+            self._write({
+                "time": time.time(), "module": module, "model": model,
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "cached_tokens": cached_tokens, "cost_usd": round(cost, 6),
+                "queue_ms": round(queue_seconds * 1000, 1), "latency_ms": round(latency_seconds * 1000, 1),
+                "ttft_ms": None if ttft_seconds is None else round(ttft_seconds * 1000, 1),
+                "retries": retries, "error": error,
+            })
+
+    def record_cache_hit(self, module, source):
+        """Record an answer served without an LLM call, e.g. from the lexicon or the moderation cache."""
+        with self._lock:
+            self._counters[("cache_hits", (module, source))] += 1
+            self._write({"time": time.time(), "module": module, "cache_hit": source})
+
+    def record_lookup(self, module, source, hit):
+        """Record one cache lookup, e.g. in the lexicon; a hit also counts as a cache hit."""
+        with self._lock:
+            self._counters[("lookups", (module, source), "hit" if hit else "miss")] += 1
+            if hit:
+                self._counters[("cache_hits", (module, source))] += 1
+            self._write({"time": time.time(), "module": module, "lookup": source, "hit": hit})
+
+    def record_answer_ttft(self, module, seconds):
+        """Record the time from a button press to the first token shown, streamed or not."""
+        with self._lock:
+            self._histogram("answer_ttft", (module,), SECONDS_BUCKETS).observe(seconds)
+            self._write({"time": time.time(), "module": module, "answer_ttft_ms": round(seconds * 1000, 1)})
+
+    def record_count(self, name, value=1, **labels):
+        """Add value to one of the COUNTERS, e.g. record_count("moderation_checks", tier="cache")."""
+        if name not in COUNTERS:
+            raise ValueError(f"Unknown counter: {name}")
+        with self._lock:
+            self._counters[("count", name, tuple(sorted(labels.items())))] += value
+            self._write({"time": time.time(), "count": name, "labels": labels, "value": value})
+
+    def prometheus_text(self):
+        """All aggregates in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+            lines = []
+            metrics = [
+                ("llm_calls_total", "calls", "LLM completions by outcome."),
+                ("llm_prompt_tokens_total", "prompt_tokens", "Prompt tokens sent."),
+                ("llm_completion_tokens_total", "completion_tokens", "Completion tokens received."),
+                ("llm_cached_tokens_total", "cached_tokens", "Prompt tokens served from the provider's prompt cache."),
+                ("llm_retries_total", "retries", "Retried attempts."),
+                ("llm_cost_usd_total", "cost", "Estimated spend in USD."),
+            ]
+            for name, counter, help_text in metrics:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (kind, (module, model), *status), value in sorted(
+                        (key, value) for key, value in counters.items() if key[0] == counter):
+                    labels = f'module="{module}",model="{model}"' + (f',status="{status[0]}"' if status else "")
+                    lines.append(f"{name}{{{labels}}} {value:g}")
+            lines += ["# HELP llm_cache_hits_total Answers served without an LLM call.",
+                      "# TYPE llm_cache_hits_total counter"]
+            for (_, (module, source)), value in sorted(
+                    (key, value) for key, value in counters.items() if key[0] == "cache_hits"):
+                lines.append(f'llm_cache_hits_total{{module="{module}",source="{source}"}} {value:g}')
+            lines += ["# HELP llm_cache_lookups_total Cache lookups by result, for hit ratios.",
+                      "# TYPE llm_cache_lookups_total counter"]
+            for (_, (module, source), result), value in sorted(
+                    (key, value) for key, value in counters.items() if key[0] == "lookups"):
+                lines.append(f'llm_cache_lookups_total{{module="{module}",source="{source}",result="{result}"}} {value:g}')
+            for name, help_text in COUNTERS.items():
+                lines += [f"# HELP {name}_total {help_text}", f"# TYPE {name}_total counter"]
+                for (_, _, labels), value in sorted(
+                        (key, value) for key, value in counters.items() if key[:2] == ("count", name)):
+                    label_text = ",".join(f'{label}="{label_value}"' for label, label_value in labels)
+                    lines.append(f"{name}_total{{{label_text}}} {value:g}")
+            lines += ["# HELP llm_answer_ttft_seconds Time from a request to the first answer token shown.",
+                      "# TYPE llm_answer_ttft_seconds histogram"]
+            for (hist_name, key), histogram in sorted(histograms.items()):
+                if hist_name == "answer_ttft":
+                    lines.extend(histogram.lines("llm_answer_ttft_seconds", f'module="{key[0]}"'))
+            for name, metric, help_text in [
+                ("latency", "llm_latency_seconds", "Time from request to last token, including queueing and retries."),
+                ("queue", "llm_queue_seconds", "Time waiting for the model's concurrency slot."),
+                ("ttft", "llm_ttft_seconds", "Time to first streamed token."),
+                ("tokens", "llm_tokens_per_call", "Prompt plus completion tokens per call."),
+            ]:
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+                for (hist_name, key), histogram in sorted(histograms.items()):
+                    if hist_name == name:
+                        module, model = key
+                        lines.extend(histogram.lines(metric, f'module="{module}",model="{model}"'))
+        return "\n".join(lines) + "\n"
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = LLMMetrics()
+    return _metrics
+
+
+def record_cache_hit(module, source):
+    get_metrics().record_cache_hit(module, source)
+
+
+def record_lookup(module, source, hit):
+    get_metrics().record_lookup(module, source, hit)
+
+
+def record_answer_ttft(module, seconds):
+    get_metrics().record_answer_ttft(module, seconds)
+
+
+def record_count(name, value=1, **labels):
+    get_metrics().record_count(name, value, **labels)
+
+
+def load_rows(path=METRICS_PATH, since=None):
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [row for row in rows if since is None or row["time"] >= since]
+
+
+def replay(rows):
+    """Rebuild the aggregates from JSONL rows, e.g. to export them from outside the app process."""
+    metrics = LLMMetrics(path=None)
+    for row in rows:
+        if "cache_hit" in row:
+            metrics.record_cache_hit(row["module"], row["cache_hit"])
+            continue
+        if "lookup" in row:
+            metrics.record_lookup(row["module"], row["lookup"], row["hit"])
+            continue
+        if "answer_ttft_ms" in row:
+            metrics.record_answer_ttft(row["module"], row["answer_ttft_ms"] / 1000)
+            continue
+        if "count" in row:
+            metrics.record_count(row["count"], row["value"], **row["labels"])
+            continue
+        metrics.record_call(
+            row["module"], row["model"], row["prompt_tokens"], row["completion_tokens"], row["cached_tokens"],
+            row["queue_ms"] / 1000, None if row["ttft_ms"] is None else row["ttft_ms"] / 1000,
+            row["latency_ms"] / 1000, row["retries"], row["error"],
+        )
+    return metrics
+
+
+def summarize(rows):
+    """Per-module totals and latency percentiles from JSONL rows."""
+    by_module = defaultdict(list)
+    cache_hits = defaultdict(int)
+    lookups = defaultdict(int)
+    answer_ttfts = defaultdict(list)
+    for row in rows:
+        if "count" in row:
+            continue
+        if "answer_ttft_ms" in row:
+            answer_ttfts[row["module"]].append(row["answer_ttft_ms"])
+        elif "cache_hit" in row:
+            cache_hits[row["module"]] += 1
+        elif "lookup" in row:
+            lookups[row["module"]] += 1
+            cache_hits[row["module"]] += row["hit"]
+        else:
+            by_module[row["module"]].append(row)
+    summary = {}
+    for module in sorted(set(by_module) | set(cache_hits) | set(answer_ttfts)):
+        calls = by_module.get(module, [])
+        latencies = [row["latency_ms"] for row in calls]
+        ttfts = [row["ttft_ms"] for row in calls if row["ttft_ms"] is not None]
+        prompt_tokens = sum(row["prompt_tokens"] for row in calls)
+        summary[module] = {
+            "calls": len(calls),
+            "errors": sum(1 for row in calls if row["error"]),
+            "cache_hits": cache_hits.get(module, 0),
+            # Share of cache lookups answered without an LLM call
+            "lookup_hit_rate": round(cache_hits.get(module, 0) / lookups[module], 3) if lookups.get(module) else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": sum(row["completion_tokens"] for row in calls),
+            "cached_tokens": sum(row["cached_tokens"] for row in calls),
+            # Share of prompt tokens the provider served from its prompt cache
+            "cached_ratio": round(sum(row["cached_tokens"] for row in calls) / prompt_tokens, 3) if prompt_tokens else 0.0,
+            "cost_usd": round(sum(row["cost_usd"] for row in calls), 4),
+            "retries": sum(row["retries"] for row in calls),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+            "p95_ms": round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+            "queue_p95_ms": round(float(np.percentile([row["queue_ms"] for row in calls], 95)), 1) if calls else None,
+            "ttft_p50_ms": round(float(np.percentile(ttfts, 50)), 1) if ttfts else None,
+            "answer_ttft_p50_ms": round(float(np.percentile(answer_ttfts[module], 50)), 1) if answer_ttfts.get(module) else None,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize LLM calls per mode from the metrics log.")
+    parser.add_argument("--path", default=METRICS_PATH, help="JSONL metrics log")
+    parser.add_argument("--hours", type=float, help="Only include the last N hours")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    parser.add_argument("--prometheus", action="store_true", help="Print the aggregates in Prometheus text format")
+    args = parser.parse_args()
+
+    since = time.time() - args.hours * 3600 if args.hours else None
+    rows = load_rows(args.path, since)
+    if args.prometheus:
+        print(replay(rows).prometheus_text(), end="")
+        return
+    summary = summarize(rows)
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+        return
+    columns = ["calls", "errors", "cache_hits", "lookup_hit_rate", "prompt_tokens", "cached_ratio", "completion_tokens", "cost_usd",
+               "retries", "p50_ms", "p95_ms", "ttft_p50_ms", "answer_ttft_p50_ms"]
+    print(f"{'module':<22}" + "".join(f"{column:>18}" for column in columns))
+    for module, values in summary.items():
+        print(f"{module:<22}" + "".join(f"{str(values[column]):>18}" for column in columns))
+    total_cost = sum(values["cost_usd"] for values in summary.values())
+    print(f"\nTotal estimated cost: ${total_cost:.4f}")
+
+
+if __name__ == "__main__":
+    main()
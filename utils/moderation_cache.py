@@ -0,0 +1,127 @@
+# utils/moderation_cache.py
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.tamil_text import text_hash
+
+DEFAULT_CACHE_PATH = "data/moderation_cache/verdicts.sqlite"
+DEFAULT_MAX_ENTRIES = int(os.getenv("MODERATION_CACHE_MAX_ENTRIES", 4096))
+DEFAULT_TTL_SECONDS = int(os.getenv("MODERATION_CACHE_TTL_SECONDS", 30 * 24 * 60 * 60))
+
+
+class ModerationCache:
+    """
+    Moderation verdicts keyed by (prompt version, normalized text hash).
+
+    A bounded in-memory LRU sits in front of a SQLite table shared by every
+    process on the machine. Verdicts older than ttl_seconds are treated as
+    misses, so a changed model or policy is picked up eventually even
+    without a new prompt version.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS verdicts (
+                   prompt_version TEXT NOT NULL,
+                   text_hash TEXT NOT NULL,
+                   flagged INTEGER NOT NULL,
+                   created REAL NOT NULL,
+                   PRIMARY KEY (prompt_version, text_hash)
+               )"""
+        )
+        self._db.commit()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _fresh(self, created):
+        return self.ttl_seconds is None or time.time() - created < self.ttl_seconds
+
+    def _remember(self, key, flagged, created):
+        self._entries[key] = (created, flagged)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, prompt_version, texts):
+        """Return the cached verdict (True = flagged) for each text, or None on a miss."""
+        keys = [(prompt_version, text_hash(text)) for text in texts]
+        results = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self._fresh(entry[0]):
+                    self._entries.move_to_end(key)
+                    results[key] = entry[1]
+                    self.hits += 1
+            missing = list(dict.fromkeys(key for key in keys if key not in results))
+            for start in range(0, len(missing), 500):
+                chunk = [h for _, h in missing[start:start + 500]]
+                rows = self._db.execute(
+                    f"SELECT text_hash, flagged, created FROM verdicts WHERE prompt_version = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [prompt_version, *chunk],
+                )
+                for h, flagged, created in rows:
+                    if self._fresh(created):
+                        self._remember((prompt_version, h), bool(flagged), created)
+                        results[(prompt_version, h)] = bool(flagged)
+            for key in keys:
+                if key in missing:
+                    if key in results:
+                        self.disk_hits += 1
+                    else:
+                        self.misses += 1
+        return [results.get(key) for key in keys]
+
+    def get(self, prompt_version, text):
+        return self.get_many(prompt_version, [text])[0]
+
+    def put_many(self, prompt_version, texts, verdicts):
+        now = time.time()
+        rows = {text_hash(text): bool(flagged) for text, flagged in zip(texts, verdicts)}
+        with self._lock:
+            for h, flagged in rows.items():
+                self._remember((prompt_version, h), flagged, now)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO verdicts (prompt_version, text_hash, flagged, created) VALUES (?, ?, ?, ?)",
+                [(prompt_version, h, int(flagged), now) for h, flagged in rows.items()],
+            )
+            self._db.commit()
+
+    def put(self, prompt_version, text, flagged):
+        self.put_many(prompt_version, [text], [flagged])
+
+    def purge_expired(self):
+        """Delete verdicts older than the TTL from disk; returns how many were removed."""
+        if self.ttl_seconds is None:
+            return 0
+        with self._lock:
+            removed = self._db.execute(
+                "DELETE FROM verdicts WHERE created < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            self._db.commit()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "entries": entries,
+            }
@@ -0,0 +1,125 @@
+# utils/moderation_classifier.py
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from utils.tamil_text import normalize_text, phonetic_key, transliterate
+
+MODEL_PATH = "data/moderation/classifier.npz"
+FEATURE_BUCKETS = 1 << 18
+
+
+def features(text):
+    """Hashed feature ids: words, their phonetic keys and romanized character trigrams."""
+    ids = []
+    for word in normalize_text(text).split():
+        romanized = transliterate(word)
+        grams = ["w:" + word, "p:" + phonetic_key(word)]
+        padded = f"<{romanized}>"
+        grams.extend("c:" + padded[i:i + 3] for i in range(len(padded) - 2))
+        for gram in grams:
+            digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+            ids.append(int.from_bytes(digest, "little") % FEATURE_BUCKETS)
+    return ids
+
+
+class NaiveBayesClassifier:
+    """
+    Multinomial naive Bayes over hashed features; two classes, clean and flagged.
+
+    Small enough to load in milliseconds and score on the CPU in well under a
+    millisecond, which is the point: it only has to be sure about the easy cases.
+    """
+
+    def __init__(self, log_prior, log_likelihood):
+        self.log_prior = log_prior
+        self.log_likelihood = log_likelihood
+
+    @classmethod
+    def train(cls, examples, alpha=1.0):
+        """Fit on (text, flagged) pairs."""
+        counts = np.full((2, FEATURE_BUCKETS), alpha, dtype=np.float64)
+        labels = np.zeros(2)
+        for text, flagged in examples:
+            label = int(bool(flagged))
+            labels[label] += 1
+            np.add.at(counts[label], features(text), 1)
+        if not labels.all():
+            raise ValueError("Training data needs both clean and flagged examples.")
+        log_prior = np.log(labels / labels.sum())
+        log_likelihood = np.log(counts / counts.sum(axis=1, keepdims=True)).astype(np.float32)
+        return cls(log_prior, log_likelihood)
+
+    def flagged_probability(self, text):
+        ids = features(text)
+        if not ids:
+            return None
+        scores = self.log_prior + self.log_likelihood[:, ids].sum(axis=1)
+        return float(1.0 / (1.0 + np.exp(scores[0] - scores[1])))
+
+    def save(self, path=MODEL_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, log_prior=self.log_prior, log_likelihood=self.log_likelihood)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        """Return the saved classifier, or None if none has been trained."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["log_prior"], data["log_likelihood"])
+
+
+def load_examples(path):
+    """Read labelled examples: one {"text", "flagged"} object per line."""
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["text"], row["flagged"]) for row in rows]
+
+
+def evaluate(classifier, examples, clean_below, flag_above):
+    """How many examples the classifier decides at these thresholds, and how many of those it gets wrong."""
+    decided = wrong = 0
+    for text, flagged in examples:
+        probability = classifier.flagged_probability(text)
+        if probability is None or clean_below <= probability <= flag_above:
+            continue
+        decided += 1
+        wrong += (probability > flag_above) != bool(flagged)
+    return {"examples": len(examples), "decided": decided, "wrong": wrong}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local moderation classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="Fit the classifier on labelled JSONL and save it")
+    train.add_argument("examples", help='JSONL with {"text": ..., "flagged": true/false} per line')
+    train.add_argument("--out", default=MODEL_PATH)
+    check = sub.add_parser("eval", help="Report coverage and errors on held-out labelled JSONL")
+    check.add_argument("examples")
+    check.add_argument("--model", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    from utils.content_filter import CLASSIFIER_CLEAN_BELOW, CLASSIFIER_FLAG_ABOVE
+
+    examples = load_examples(args.examples)
+    if args.command == "train":
+        classifier = NaiveBayesClassifier.train(examples)
+        classifier.save(args.out)
+        print(f"Trained on {len(examples)} examples; saved {args.out}")
+        print(evaluate(classifier, examples, CLASSIFIER_CLEAN_BELOW, CLASSIFIER_FLAG_ABOVE))
+        return
+    classifier = NaiveBayesClassifier.load(args.model)
+    if classifier is None:
+        raise SystemExit(f"No classifier at {args.model}; train one first.")
+    print(evaluate(classifier, examples, CLASSIFIER_CLEAN_BELOW, CLASSIFIER_FLAG_ABOVE))
+
+
+if __name__ == "__main__":
+    main()
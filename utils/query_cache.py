@@ -0,0 +1,102 @@
+# utils/query_cache.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from langchain.embeddings.base import Embeddings
+
+from utils.tamil_text import normalize_text
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 4096))
+DEFAULT_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL_SECONDS", 24 * 60 * 60))
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded in-memory LRU of query embeddings with a time-to-live.
+
+    Keys are (model, normalized query text). When disk_cache (an
+    utils.embedding_cache.EmbeddingCache) is given, memory misses are looked
+    up there before going to the network, and new vectors are written back.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, disk_cache=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_cache = disk_cache
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, model, text):
+        key = (model, normalize_text(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, vector = entry
+                if self.ttl_seconds is None or time.time() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+        if self.disk_cache is not None:
+            vector = self.disk_cache.get_many(model, [text])[0]
+            if vector is not None:
+                self._store(key, vector)
+                with self._lock:
+                    self.disk_hits += 1
+                return vector
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model, text, vector):
+        self._store((model, normalize_text(text)), vector)
+        if self.disk_cache is not None:
+            self.disk_cache.put_many(model, [text], [vector])
+
+    def _store(self, key, vector):
+        with self._lock:
+            self._entries[key] = (time.time(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Put a QueryEmbeddingCache in front of embed_query.
+
+    Works with langchain's OpenAIEmbeddings and with utils.rag_pipeline.OpenAIEmbedding;
+    embed_documents is passed straight through.
+    """
+
+    def __init__(self, embeddings, cache=None):
+        self.embeddings = embeddings
+        self.cache = cache or QueryEmbeddingCache()
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        vector = self.cache.get(self.model, text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(self.model, text, vector)
+        return vector
@@ -1,25 +1,98 @@
 # utils/rag_pipeline.py
 
 import os
-from openai import OpenAI
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tiktoken
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from langchain_community.vectorstores import FAISS
 from langchain.chains import ConversationalRetrievalChain
-from langchain.llms.openai import OpenAI as LangchainOpenAI
 from langchain.embeddings.base import Embeddings
+from utils.llm_factory import get_chat_llm, get_http_client
+from utils.query_cache import CachedQueryEmbeddings
+
+logger = logging.getLogger(__name__)
 
 # Initialize the OpenAI client using the API key
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=get_http_client())
+
+# Per-request limits of the embeddings endpoint
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 300000
+
+# Errors worth retrying; anything else (bad input, auth) fails immediately
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
 
 # Define a custom Embeddings class compatible with FAISS
 class OpenAIEmbedding(Embeddings):
-    def __init__(self, client, model="text-embedding-ada-002"):
+    def __init__(self, client, model="text-embedding-ada-002", max_batch_tokens=MAX_BATCH_TOKENS,
+                 max_batch_inputs=MAX_BATCH_INPUTS, max_workers=4, max_retries=5):
         self.client = client
         self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.encoding = tiktoken.get_encoding("cl100k_base")
+        # Throughput of the most recent embed_documents call
+        self.last_stats = {}
+
+    def _make_batches(self, token_counts):
+        """Pack consecutive texts into (start, end) ranges that fit one request."""
+        batches = []
+        start, batch_tokens = 0, 0
+        for idx, count in enumerate(token_counts):
+            full = idx - start >= self.max_batch_inputs or batch_tokens + count > self.max_batch_tokens
+            if full and idx > start:
+                batches.append((start, idx))
+                start, batch_tokens = idx, 0
+            batch_tokens += count
+        if start < len(token_counts):
+            batches.append((start, len(token_counts)))
+        return batches
+
+    def _embed_batch(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.embeddings.create(input=batch, model=self.model)
+                # The API may return items out of order; put them back by index
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(30, 2 ** attempt) + random.uniform(0, 1)
+                logger.warning("Embedding batch of %d failed (%s), retrying in %.1fs", len(batch), e, delay)
+                time.sleep(delay)
 
     def embed_documents(self, texts):
         # Batch processing of texts to get embeddings
+        start_time = time.perf_counter()
         cleaned_texts = [text.replace("\n", " ") for text in texts]
-        embeddings = [self.client.embeddings.create(input=[text], model=self.model).data[0].embedding for text in cleaned_texts]
+        token_counts = [len(tokens) for tokens in self.encoding.encode_batch(cleaned_texts)]
+        batches = [cleaned_texts[start:end] for start, end in self._make_batches(token_counts)]
+
+        # pool.map keeps results in batch order, so output order matches the input
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(self._embed_batch, batches))
+        embeddings = [embedding for batch in results for embedding in batch]
+
+        elapsed = max(time.perf_counter() - start_time, 1e-9)
+        self.last_stats = {
+            "texts": len(texts),
+            "tokens": sum(token_counts),
+            "batches": len(batches),
+            "seconds": elapsed,
+            "texts_per_second": len(texts) / elapsed,
+            "tokens_per_second": sum(token_counts) / elapsed,
+        }
+        logger.info(
+            "Embedded %d texts (%d tokens) in %d batches: %.1f texts/s, %.1f tokens/s",
+            len(texts), sum(token_counts), len(batches),
+            self.last_stats["texts_per_second"], self.last_stats["tokens_per_second"],
+        )
         return embeddings
 
     def embed_query(self, text):
@@ -30,14 +103,14 @@ class OpenAIEmbedding(Embeddings):
 
 # Function to load the RAG (Retrieval-Augmented Generation) chain
 def load_rag_chain():
-    # Initialize the OpenAIEmbedding class
-    embedding_model = OpenAIEmbedding(client)
+    # Initialize the OpenAIEmbedding class, caching repeated queries
+    embedding_model = CachedQueryEmbeddings(OpenAIEmbedding(client))
 
     # Create or load the FAISS vector store using the embedding model
     vectorstore = FAISS.from_texts(["sample text to create initial index"], embedding_model)
 
-    # Correctly configure the OpenAI model with the latest setup
-    llm = LangchainOpenAI(model="gpt-4", openai_api_key=os.getenv("OPENAI_API_KEY"))
+    # Goes through the shared gateway for its timeouts, retries and concurrency limits
+    llm = get_chat_llm(model_name="gpt-4", module="rag_pipeline")
     
     # Define the conversational retrieval chain with the OpenAI LLM model
     qa_chain = ConversationalRetrievalChain.from_llm(
@@ -0,0 +1,276 @@
+# utils/retrieval_benchmark.py
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import faiss
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from utils.context_packer import count_tokens
+from utils.lexical_index import stem, tokenize
+from utils.tamil_text import normalize_text
+from utils.vectorstore_registry import CURRENT_NAME, get_embeddings, get_vectorstore
+
+QUERIES_PATH = "data/benchmark/queries.jsonl"
+RESULTS_PATH = "data/benchmark/results.json"
+# A recommended cutoff keeps the best relevant chunk for this share of labelled queries
+CALIBRATION_RECALL = 0.9
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic offline stand-in for OpenAIEmbeddings.
+
+    Each stemmed word and each character trigram of it is hashed into one
+    of `dim` signed buckets and the vector is L2-normalized, so texts that
+    share words land close together. It has no idea of meaning; use it to
+    compare stores with each other, not as a measure of production quality.
+    """
+
+    def __init__(self, dim=1536):
+        self.dim = dim
+
+    def _features(self, text):
+        for token in tokenize(text):
+            word = stem(token)
+            yield "w:" + word
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i + 3]
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def load_queries(path=QUERIES_PATH):
+    """Read the query set: one {"query", "relevant": [phrases]} object per line."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def rss_bytes():
+    """Resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # No /proc (macOS, Windows): report the peak instead
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _stored_documents(vectorstore):
+    return [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+        for position in range(vectorstore.index.ntotal)
+    ]
+
+
+def _reindex(vectorstore, embeddings, documents):
+    """
+    Swap the store's vectors for stand-in vectors, keeping the index type.
+
+    A trained index (IVF, PQ) keeps the coarse structure learned from the
+    real vectors, so its recall here is a lower bound.
+    """
+    index = faiss.clone_index(vectorstore.index)
+    index.reset()
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+    index.add(vectors)
+    vectorstore.index = index
+
+
+def _relevant_positions(documents, phrases):
+    phrases = [normalize_text(phrase) for phrase in phrases]
+    return {
+        position for position, doc in enumerate(documents)
+        if any(phrase in normalize_text(doc.page_content) for phrase in phrases)
+    }
+
+
+def benchmark_store(store_path, queries, k=4, live=False):
+    """
+    Measure one vector store against the query set.
+
+    Args:
+        store_path (str): Vector store directory.
+        queries (list[dict]): Output of load_queries().
+        k (int): Chunks retrieved per query.
+        live (bool): Query the stored vectors with OpenAI embeddings instead
+            of re-embedding the chunks with HashingEmbeddings.
+
+    Returns:
+        dict: Load time, RSS after load, search latency percentiles,
+        recall@k against the labelled chunks and context tokens per query.
+    """
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    if live:
+        vectorstore = get_vectorstore(store_path)
+    else:
+        # The dimension is only known once the index is read
+        embeddings = HashingEmbeddings()
+        vectorstore = get_vectorstore(store_path, embeddings=embeddings)
+    load_seconds = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    documents = _stored_documents(vectorstore)
+    if live:
+        embeddings = get_embeddings()
+    else:
+        embeddings.dim = vectorstore.index.d
+        _reindex(vectorstore, embeddings, documents)
+
+    # Warm up the index and tokenizer before timing
+    vectorstore.similarity_search(queries[0]["query"], k=k)
+    count_tokens(queries[0]["query"])
+
+    latencies, recalls, context_tokens = [], [], []
+    for item in queries:
+        embedding = embeddings.embed_query(item["query"])
+        start = time.perf_counter()
+        _, positions = vectorstore.index.search(np.asarray([embedding], dtype=np.float32), k)
+        retrieved = [
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(position)])
+            for position in positions[0] if position != -1
+        ]
+        latencies.append(time.perf_counter() - start)
+        context_tokens.append(count_tokens("\n\n".join(doc.page_content for doc in retrieved)))
+
+        relevant = _relevant_positions(documents, item["relevant"])
+        if relevant:
+            found = {int(position) for position in positions[0]} & relevant
+            recalls.append(len(found) / min(k, len(relevant)))
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "store": store_path,
+        "embeddings": "openai" if live else "hashing",
+        "documents": len(documents),
+        "dim": int(vectorstore.index.d),
+        "load_ms": round(load_seconds * 1000, 2),
+        "rss_mb": round(rss_after / 2 ** 20, 1),
+        "rss_delta_mb": round((rss_after - rss_before) / 2 ** 20, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+        f"recall@{k}": round(float(np.mean(recalls)), 4) if recalls else None,
+        "labelled_queries": len(recalls),
+        "context_tokens_mean": round(float(np.mean(context_tokens)), 1),
+        "context_tokens_max": int(max(context_tokens)),
+    }
+
+
+def calibrate_store(store_path, queries, k=4):
+    """
+    Measure where a relevance cutoff should sit for one store.
+
+    Queries are embedded with OpenAI, since a cutoff only means something
+    on the scale production queries score on. Scores are langchain's FAISS
+    relevance, the scale utils.context_packer.SCORE_THRESHOLD is set on.
+
+    Returns:
+        dict: Percentiles of the best relevant chunk's score per labelled
+        query and of the unrelated chunks in the top k, the highest cutoff
+        that keeps the best relevant chunk for CALIBRATION_RECALL of the
+        queries, and the share of unrelated top-k chunks it drops.
+    """
+    vectorstore = get_vectorstore(store_path)
+    embeddings = get_embeddings()
+    relevance_fn = vectorstore._select_relevance_score_fn()
+    documents = _stored_documents(vectorstore)
+
+    relevant_best, unrelated = [], []
+    for item in queries:
+        relevant = _relevant_positions(documents, item["relevant"])
+        if not relevant:
+            continue
+        embedding = np.asarray([embeddings.embed_query(item["query"])], dtype=np.float32)
+        distances, positions = vectorstore.index.search(embedding, vectorstore.index.ntotal)
+        scores = {int(position): relevance_fn(float(distance))
+                  for position, distance in zip(positions[0], distances[0]) if position != -1}
+        relevant_best.append(max(scores.get(position, 0.0) for position in relevant))
+        unrelated.extend(scores[int(position)] for position in positions[0][:k] if int(position) not in relevant)
+    if not relevant_best:
+        raise ValueError(f"No labelled query has a relevant chunk in {store_path}")
+
+    relevant_best.sort()
+    cutoff = relevant_best[int(len(relevant_best) * (1 - CALIBRATION_RECALL))]
+
+    def percentiles(values):
+        return {f"p{q}": round(float(np.percentile(values, q)), 4) for q in (10, 50, 90)} if values else None
+
+    return {
+        "store": store_path,
+        "labelled_queries": len(relevant_best),
+        "best_relevant": percentiles(relevant_best),
+        f"unrelated@{k}": percentiles(unrelated),
+        "recommended_cutoff": round(cutoff, 3),
+        "unrelated_dropped": round(sum(score < cutoff for score in unrelated) / len(unrelated), 4) if unrelated else None,
+    }
+
+
+def find_stores(data_dir="data"):
+    return sorted({
+        os.path.dirname(path)
+        for name in ("index.faiss", CURRENT_NAME)
+        for path in glob.glob(os.path.join(data_dir, "*", name))
+    })
+
+
+def run_benchmarks(store_paths, queries, k=4, live=False):
+    """Benchmark each store in a fresh process so load time and RSS are not shared."""
+    results = []
+    for store_path in store_paths:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            try:
+                results.append(pool.submit(benchmark_store, store_path, queries, k, live).result())
+            except Exception as e:
+                results.append({"store": store_path, "error": f"{type(e).__name__}: {e}"})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark load time, latency and recall of the vector stores.")
+    parser.add_argument("stores", nargs="*", help="Vector store directories; defaults to every store under data/")
+    parser.add_argument("--queries", default=QUERIES_PATH, help="Labelled query set (JSONL)")
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--live", action="store_true", help="Embed queries with OpenAI against the stored vectors")
+    parser.add_argument("--json", default=RESULTS_PATH, help="Write the results to this file")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Recommend a context relevance cutoff per store instead of benchmarking (needs --live)")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        if not args.live:
+            parser.error("--calibrate needs --live: a cutoff is only meaningful on OpenAI embedding scores")
+        for store_path in args.stores or find_stores():
+            print(json.dumps(calibrate_store(store_path, load_queries(args.queries), k=args.k), ensure_ascii=False))
+        return
+
+    results = run_benchmarks(args.stores or find_stores(), load_queries(args.queries), k=args.k, live=args.live)
+    for row in results:
+        print(json.dumps(row, ensure_ascii=False))
+    os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# utils/streaming.py
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import wait as wait_futures
+
+import numpy as np
+from langchain.callbacks.base import BaseCallbackHandler
+
+from utils.llm_metrics import record_answer_ttft
+
+logger = logging.getLogger(__name__)
+
+# Recent time-to-first-token samples kept per mode
+TTFT_SAMPLES = 1000
+
+_ttft = defaultdict(lambda: deque(maxlen=TTFT_SAMPLES))
+_ttft_lock = threading.Lock()
+
+
+def record_ttft(mode, seconds):
+    with _ttft_lock:
+        _ttft[mode].append(seconds)
+    record_answer_ttft(mode, seconds)
+    logger.info("Time to first token for %s: %.0f ms", mode, seconds * 1000)
+
+
+def ttft_stats():
+    """Time-to-first-token percentiles per mode, in milliseconds."""
+    with _ttft_lock:
+        samples = {mode: list(values) for mode, values in _ttft.items()}
+    return {
+        mode: {
+            "count": len(values),
+            "p50_ms": round(float(np.percentile(values, 50)) * 1000, 1),
+            "p95_ms": round(float(np.percentile(values, 95)) * 1000, 1),
+        }
+        for mode, values in samples.items() if values
+    }
+
+
+class StreamingAnswer(BaseCallbackHandler):
+    """
+    Callback that shows an answer in a Streamlit placeholder as tokens arrive.
+
+    Pass it to a chain call, e.g. chain.run(..., callbacks=[stream]); the LLM
+    must be built with streaming=True. The formatter is applied to the text
+    so far on every render, so bullets appear line by line.
+
+    Streamlit elements can only be updated from the script thread. Tokens
+    produced there are rendered at once; tokens produced in a worker thread
+    are buffered until the script thread calls wait() on the worker's future.
+    """
+
+    def __init__(self, placeholder, mode, formatter=None, poll_interval=0.05):
+        self.placeholder = placeholder
+        self.mode = mode
+        self.formatter = formatter or (lambda text: text)
+        self.poll_interval = poll_interval
+        self.started = time.perf_counter()
+        self.first_token_seconds = None
+        self._tokens = []
+        self._rendered = ""
+        self._lock = threading.Lock()
+        self._script_thread = threading.current_thread()
+
+    def _first_output(self):
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self.started
+            record_ttft(self.mode, self.first_token_seconds)
+
+    def on_llm_new_token(self, token, **kwargs):
+        with self._lock:
+            self._first_output()
+            self._tokens.append(token)
+        if threading.current_thread() is self._script_thread:
+            self.render()
+
+    def text(self):
+        with self._lock:
+            return "".join(self._tokens)
+
+    def render(self):
+        text = self.text()
+        if text and text != self._rendered:
+            self._rendered = text
+            self.placeholder.markdown(
+                f"<div class='chat-message assistant-message'>{self.formatter(text)}</div>",
+                unsafe_allow_html=True,
+            )
+
+    def wait(self, future):
+        """Render tokens from a worker thread until its future completes, then return its result."""
+        # Poll for completion rather than catching TimeoutError from result(),
+        # which would also swallow a TimeoutError raised by the work itself
+        while not wait_futures([future], timeout=self.poll_interval).done:
+            self.render()
+        self.render()
+        return future.result()
+
+    def finish(self, answer=None):
+        """
+        Clear the placeholder once the final answer is shown elsewhere.
+
+        Answers that never streamed, such as lexicon hits, count their
+        full latency as the time to first token.
+        """
+        if answer is not None:
+            with self._lock:
+                self._first_output()
+        self.placeholder.empty()
@@ -0,0 +1,111 @@
+# utils/structured_output.py
+
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from utils.llm_metrics import record_count
+
+logger = logging.getLogger(__name__)
+
+_TYPES = {"object": dict, "array": list, "string": str, "integer": int, "boolean": bool}
+
+_stats = defaultdict(lambda: {"exercises": 0, "llm_calls": 0, "parse_failures": 0, "schema_failures": 0,
+                              "repairs": 0, "repaired": 0, "failures": 0})
+_stats_lock = threading.Lock()
+
+
+def validate(data, schema, path="$"):
+    """
+    Check data against the subset of JSON Schema the generators use.
+
+    Supports type, properties, required, items, minItems, maxItems and
+    minLength. Returns a list of error strings; empty means valid.
+    """
+    expected = _TYPES[schema["type"]]
+    if not isinstance(data, expected) or (expected is int and isinstance(data, bool)):
+        return [f"{path}: expected {schema['type']}"]
+    errors = []
+    if expected is dict:
+        for name in schema.get("required", []):
+            if name not in data:
+                errors.append(f"{path}.{name}: missing")
+        for name, subschema in schema.get("properties", {}).items():
+            if name in data:
+                errors.extend(validate(data[name], subschema, f"{path}.{name}"))
+    elif expected is list:
+        if len(data) < schema.get("minItems", 0):
+            errors.append(f"{path}: expected at least {schema['minItems']} items, got {len(data)}")
+        if "maxItems" in schema and len(data) > schema["maxItems"]:
+            errors.append(f"{path}: expected at most {schema['maxItems']} items, got {len(data)}")
+        for i, item in enumerate(data):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    elif expected is str and len(data.strip()) < schema.get("minLength", 0):
+        errors.append(f"{path}: too short")
+    return errors
+
+
+def response_format(name, schema):
+    """OpenAI response_format asking for JSON that follows the schema."""
+    # Not strict: strict mode rejects minItems, which the validator enforces instead
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": False}}
+
+
+def parse_json(text):
+    """Parse a JSON object from a reply, tolerating code fences or prose around it."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(text[text.index("{"):text.rindex("}") + 1])
+
+
+def ask_json(llm, prompt, schema, name, kind):
+    """
+    Ask the LLM for a JSON object following the schema.
+
+    Args:
+        llm: Chat model from get_chat_llm.
+        prompt (str): The request, including what each field should hold.
+        schema (dict): JSON Schema of the reply.
+        name (str): Schema name sent to the API.
+        kind (str): Exercise type the call is counted under.
+
+    Returns:
+        tuple: (data, errors). data is None if the reply was not JSON;
+        errors lists schema violations so the caller can repair them.
+    """
+    record(kind, llm_calls=1)
+    response = llm.predict(prompt, response_format=response_format(name, schema))
+    try:
+        data = parse_json(response)
+    except ValueError:
+        record(kind, parse_failures=1)
+        logger.warning("%s reply was not JSON: %.200s", kind, response)
+        return None, ["$: not JSON"]
+    errors = validate(data, schema)
+    if errors:
+        record(kind, schema_failures=1)
+        logger.info("%s reply failed validation: %s", kind, "; ".join(errors))
+    return data, errors
+
+
+def record(kind, **counts):
+    with _stats_lock:
+        stats = _stats[kind]
+        for name, count in counts.items():
+            stats[name] += count
+    for name, count in counts.items():
+        record_count("exercise_generation", count, kind=kind, event=name)
+
+
+def generation_stats():
+    """Per exercise type: calls, parse and schema failure rates, repairs, and retries per exercise."""
+    with _stats_lock:
+        stats = {kind: dict(values) for kind, values in _stats.items()}
+    for values in stats.values():
+        exercises, calls = values["exercises"], values["llm_calls"]
+        values["parse_failure_rate"] = (values["parse_failures"] + values["schema_failures"]) / calls if calls else 0.0
+        # Every call after the first for an exercise is a retry or a repair
+        values["retries_per_exercise"] = (calls - exercises) / exercises if exercises else 0.0
+    return stats
@@ -0,0 +1,92 @@
+# utils/tamil_text.py
+
+import hashlib
+import re
+import unicodedata
+
+# Zero-width characters that PDF extraction and mobile keyboards sprinkle
+# into Tamil text without changing how it reads
+_INVISIBLE = re.compile("[\u200b\u200c\u200d\u2060\ufeff]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Normalize text so visually identical Tamil/English strings compare equal.
+
+    Applies NFC, drops zero-width characters, collapses whitespace and
+    lowercases Latin letters (Tamil has no case).
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = _INVISIBLE.sub("", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.lower()
+
+
+def text_hash(text):
+    """Stable content hash of the normalized text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+_VOWELS = {
+    "அ": "a", "ஆ": "aa", "இ": "i", "ஈ": "ii", "உ": "u", "ஊ": "uu",
+    "எ": "e", "ஏ": "ee", "ஐ": "ai", "ஒ": "o", "ஓ": "oo", "ஔ": "au", "ஃ": "k",
+}
+_CONSONANTS = {
+    "க": "k", "ங": "ng", "ச": "s", "ஞ": "nj", "ட": "t", "ண": "n", "த": "th",
+    "ந": "n", "ப": "p", "ம": "m", "ய": "y", "ர": "r", "ல": "l", "வ": "v",
+    "ழ": "zh", "ள": "l", "ற": "r", "ன": "n", "ஜ": "j", "ஷ": "sh", "ஸ": "s", "ஹ": "h",
+}
+_VOWEL_SIGNS = {
+    "ா": "aa", "ி": "i", "ீ": "ii", "ு": "u", "ூ": "uu", "ெ": "e",
+    "ே": "ee", "ை": "ai", "ொ": "o", "ோ": "oo", "ௌ": "au", "்": "",
+}
+
+
+def transliterate(text):
+    """
+    Romanize Tamil script the way people type Tamil in Latin letters.
+
+    A consonant without a vowel sign carries the inherent "a"; the virama
+    removes it. Text in other scripts is passed through normalized.
+    """
+    out = []
+    for char in normalize_text(text):
+        if char in _VOWEL_SIGNS and out and out[-1].endswith("a") and out[-1][:-1] in _CONSONANTS.values():
+            out[-1] = out[-1][:-1] + _VOWEL_SIGNS[char]
+        elif char in _CONSONANTS:
+            out.append(_CONSONANTS[char] + "a")
+        else:
+            out.append(_VOWELS.get(char, char))
+    return "".join(out)
+
+
+_LEET = str.maketrans({"@": "a", "4": "a", "3": "e", "1": "i", "!": "i", "0": "o", "$": "s", "5": "s", "7": "t"})
+
+
+def undo_leet(text):
+    """Undo common digit/symbol-for-letter substitutions, as in "f@ck" or "sh1t"."""
+    return text.translate(_LEET)
+
+
+_PHONETIC_DIGRAPHS = (("zh", "l"), ("th", "t"), ("dh", "t"), ("ch", "s"), ("sh", "s"), ("kh", "k"), ("gh", "k"), ("bh", "p"))
+_PHONETIC_LETTERS = str.maketrans({
+    "d": "t", "g": "k", "b": "p", "c": "s", "j": "s", "z": "l", "w": "v", "h": "",
+})
+
+
+def phonetic_key(text):
+    """
+    Spelling-insensitive key for romanized Tamil.
+
+    Tamil script does not mark voicing, so people typing it in Latin
+    letters write "th" or "dh", "t" or "d" for the same sound: "thevidiya"
+    and "dhevidiya" reduce to the same key. Voiced/unvoiced pairs are
+    merged and "h" is dropped; vowel length and doubled letters are kept,
+    since they are what separate kuthi from koothi. Common digit/symbol
+    substitutions are undone first.
+    """
+    key = undo_leet(transliterate(text))
+    for digraph, replacement in _PHONETIC_DIGRAPHS:
+        key = key.replace(digraph, replacement)
+    return key.translate(_PHONETIC_LETTERS)
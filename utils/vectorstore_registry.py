@@ -0,0 +1,185 @@
+# utils/vectorstore_registry.py
+
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain.embeddings.openai import OpenAIEmbeddings
+
+from utils.docstore import BLOB_NAME, OFFSETS_NAME, has_mmap_docstore, load_docstore
+from utils.llm_factory import get_http_client
+from utils.query_cache import CachedQueryEmbeddings
+
+# One entry per vector store directory and embeddings model, shared by every
+# Streamlit session and thread in this process:
+# {(abs_path, id(embeddings)): (signature, vectorstore)}. The cached store holds
+# its embeddings, so the id cannot be reused while the entry exists.
+_stores = {}
+_lock = threading.Lock()
+_embeddings = None
+
+# Stores written by publish_version keep each version in its own directory;
+# this file in the store directory names the live one
+CURRENT_NAME = "CURRENT"
+VERSION_PREFIX = "v-"
+# The live version and the one before it, for readers still loading it
+KEEP_VERSIONS = 2
+
+
+def get_embeddings():
+    """
+    Return the process-wide embeddings model used to query the stores.
+
+    Query embeddings go through an LRU cache; see get_embeddings().cache.stats().
+    """
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = CachedQueryEmbeddings(OpenAIEmbeddings(http_client=get_http_client()))
+    return _embeddings
+
+
+def resolve_store(store_path):
+    """Directory holding a store's live files: the version CURRENT names, or the store itself if unversioned."""
+    try:
+        with open(os.path.join(store_path, CURRENT_NAME), encoding="utf-8") as f:
+            return os.path.join(store_path, f.read().strip())
+    except FileNotFoundError:
+        return store_path
+
+
+def publish_version(store_path, write_files):
+    """
+    Write a new version of a store into its own directory and make it live.
+
+    write_files(directory) fills an empty directory, which is renamed into
+    place once complete. CURRENT is then swapped with os.replace, so a
+    reader resolves either the old version or the new one, never a mix of
+    their files. Versions older than the last KEEP_VERSIONS are removed.
+
+    Returns:
+        str: The new version's directory.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".publish-", dir=store_path)
+    try:
+        write_files(tmp_dir)
+        # Nanoseconds keep the names sortable by age
+        name = f"{VERSION_PREFIX}{time.time_ns()}"
+        os.rename(tmp_dir, os.path.join(store_path, name))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    pointer = os.path.join(store_path, CURRENT_NAME)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+    os.replace(pointer + ".tmp", pointer)
+
+    versions = sorted(entry for entry in os.listdir(store_path) if entry.startswith(VERSION_PREFIX))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(store_path, old), ignore_errors=True)
+    return os.path.join(store_path, name)
+
+
+def _store_files(path):
+    # Prefer the memory-mapped docstore; index.pkl is only read for stores
+    # that have not been converted with utils.docstore yet
+    if has_mmap_docstore(path):
+        return ("index.faiss", OFFSETS_NAME, BLOB_NAME)
+    return ("index.faiss", "index.pkl")
+
+
+def _store_signature(path):
+    """Identify the live files on disk so a republished store is picked up on the next call."""
+    directory = resolve_store(path)
+    signature = [directory]
+    for name in _store_files(directory):
+        stat = os.stat(os.path.join(directory, name))
+        signature.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _read_index(index_file):
+    # Memory-map the vectors so every worker shares the page cache instead of
+    # holding its own copy. Older FAISS builds cannot mmap every index type,
+    # so fall back to a regular read for those.
+    try:
+        return faiss.read_index(index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(index_file)
+
+
+def _load_vectorstore(path, embeddings):
+    index = _read_index(os.path.join(path, "index.faiss"))
+    if has_mmap_docstore(path):
+        docstore, index_to_docstore_id = load_docstore(path)
+    else:
+        with open(os.path.join(path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def get_vectorstore(vectorstore_path, embeddings=None):
+    """
+    Load a FAISS vector store once per process and return the shared instance.
+
+    The store is reloaded only when its files change on disk. A versioned
+    store is read from the directory its CURRENT pointer names, so the
+    files loaded always belong to one version. Stores with a columnar
+    docstore (see utils.docstore) are read without unpickling.
+
+    Args:
+        vectorstore_path (str): Directory written by FAISS.save_local.
+        embeddings: Embeddings model used for queries. Defaults to get_embeddings().
+            Each model gets its own instance of the store.
+
+    Returns:
+        FAISS: The loaded vector store.
+    """
+    path = os.path.abspath(vectorstore_path)
+    try:
+        signature = _store_signature(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"Vector store '{os.path.basename(path)}' not found in the data folder."
+        )
+    embeddings = embeddings or get_embeddings()
+    key = (path, id(embeddings))
+
+    entry = _stores.get(key)
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+
+    with _lock:
+        # Another thread may have loaded it while we were waiting
+        entry = _stores.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        while True:
+            try:
+                vectorstore = _load_vectorstore(signature[0], embeddings)
+                break
+            except FileNotFoundError:
+                # Two newer versions were published while we read this one
+                # and it was removed; load the live one instead
+                latest = _store_signature(path)
+                if latest == signature:
+                    raise
+                signature = latest
+        _stores[key] = (signature, vectorstore)
+        return vectorstore
+
+
+def clear_vectorstores():
+    """Drop every cached store, e.g. after rebuilding indexes in-process."""
+    with _lock:
+        _stores.clear()